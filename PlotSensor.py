@@ -10,12 +10,10 @@ import sys  # We need sys so that we can pass argv to QApplication
 import websocket
 import json
 import threading
+from plot_decimation import MinMaxDecimator
 
-#shared data
-x_data = []
-y_data = []
-z_data = []
-time_data = []
+#shared data: 10 minutes of 500 Hz samples, decimated to the plot width when drawn
+sensor_data = MinMaxDecimator(500 * 60 * 10, 3)
 
 x_data_color = "#d32f2f"   # red
 y_data_color = "#7cb342"   # green
@@ -32,14 +30,8 @@ class Sensor:
     
     # called each time when sensor data is recieved
     def on_message(self,ws, message):
-        values = json.loads(message)['values']
-        timestamp = json.loads(message)['timestamp']
-
-        x_data.append(values[0])
-        y_data.append(values[1])
-        z_data.append(values[2])
-
-        time_data.append(float(timestamp/1000000))
+        data = json.loads(message)
+        sensor_data.append(float(data['timestamp']/1000000), data['values'][:3])
 
     def on_error(self,ws, error):
         print("error occurred")
@@ -100,13 +92,20 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def update_plot_data(self):
         
-        # limit lists data to 1000 items 
-        limit = -1000 
+        # Visible time range, or the whole history while auto-ranging
+        view_box = self.graphWidget.getViewBox()
+        if view_box.autoRangeEnabled()[0]:
+            t_start = t_end = None
+        else:
+            t_start, t_end = view_box.viewRange()[0]
+
+        # At most one min/max pair per horizontal pixel
+        time_data, values = sensor_data.get(2 * self.graphWidget.width(), t_start, t_end)
 
         # Update the data.
-        self.x_data_line.setData(time_data[limit:], x_data[limit:])  
-        self.y_data_line.setData(time_data[limit:], y_data[limit:])
-        self.z_data_line.setData(time_data[limit:], z_data[limit:])
+        self.x_data_line.setData(time_data, values[:, 0])  
+        self.y_data_line.setData(time_data, values[:, 1])
+        self.z_data_line.setData(time_data, values[:, 2])
 
 
 sensor = Sensor(address = "10.0.0.128:8080", sensor_type="android.sensor.accelerometer")
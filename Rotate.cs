@@ -7,9 +7,27 @@ public class ObjectRotation : MonoBehaviour
         if (WebSocketManager.Instance != null)
         {
             WebSocketManager.Instance.RegisterOnMessageReceived(OnMessageReceived);
+            WebSocketManager.Instance.RegisterOnFrameReceived(OnFrameReceived);
         }
     }
 
+    // Binary frame: 20 byte header ("AF", version, flags, sequence, timestamp, device),
+    // then float32 quaternion [w, x, y, z] at offset 20, all little-endian
+    void OnFrameReceived(byte[] frame)
+    {
+        if (frame.Length < 36 || frame[0] != (byte)'A' || frame[1] != (byte)'F' || frame[2] != 2)
+        {
+            Debug.LogError("Not a version 2 orientation frame.");
+            return;
+        }
+
+        float w = System.BitConverter.ToSingle(frame, 20);
+        float x = System.BitConverter.ToSingle(frame, 24);
+        float y = System.BitConverter.ToSingle(frame, 28);
+        float z = System.BitConverter.ToSingle(frame, 32);
+        transform.rotation = new Quaternion(-x, -z, -y, w);
+    }
+
     void OnMessageReceived(string message)
     {
         Debug.Log("Received Message: " + message);  // Log the raw message for debugging
@@ -7,6 +7,10 @@ public class WebSocketManager : MonoBehaviour
     public static WebSocketManager Instance { get; private set; }
     private WebSocket websocket;
     public event Action<string> OnMessageReceived;
+    public event Action<byte[]> OnFrameReceived;
+
+    // Ask the server for compact binary frames (see frame_codec.py) instead of JSON
+    public bool useBinaryFrames = true;
 
     void Awake()
     {
@@ -23,10 +27,15 @@ public class WebSocketManager : MonoBehaviour
 
     async void Start()
     {
-        websocket = new WebSocket("ws://127.0.0.1:5678");
+        websocket = new WebSocket(useBinaryFrames ? "ws://127.0.0.1:5678/?format=binary&policy=latest" : "ws://127.0.0.1:5678");
 
         websocket.OnMessage += (bytes) =>
         {
+            if (useBinaryFrames)
+            {
+                OnFrameReceived?.Invoke(bytes);
+                return;
+            }
             string message = System.Text.Encoding.UTF8.GetString(bytes);
             Debug.Log("Received from WebSocket: " + message);
             OnMessageReceived?.Invoke(message);
@@ -55,5 +64,10 @@ public class WebSocketManager : MonoBehaviour
     {
         OnMessageReceived += callback;
     }
+
+    public void RegisterOnFrameReceived(Action<byte[]> callback)
+    {
+        OnFrameReceived += callback;
+    }
 }
 
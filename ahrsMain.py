@@ -8,6 +8,8 @@ from ahrs.filters import Madgwick
 from ahrsPhoneSensor import SensorDataHandler
 from ahrs_colored import ColoredGLBoxItem
 from ahrs_Mad import AhrsProcessor
+from ring_buffer import TimeSeriesBuffer
+from pointing import euler_to_matrices
 import asyncio
 import qasync
 
@@ -28,42 +30,45 @@ class MainWindow(QtWidgets.QMainWindow):
         self.create_3d_view()
         #self.create_plot_view()
         self.create_status_view()
-        self.quaternion_store = []
-        self.eulerAngles_store = []
-        self.sensor_store = []
         self.maxDataPoints = 1000
+        # Preallocated stores, twice the plotted length so views stay stable between frames
+        self.quaternion_store = TimeSeriesBuffer(2 * self.maxDataPoints, 4)
+        self.eulerAngles_store = TimeSeriesBuffer(2 * self.maxDataPoints, 3)
+        self.sensor_store = TimeSeriesBuffer(2 * self.maxDataPoints, 9)  # gyro, accel, mag
+
+        # Newest fusion state, handed from sensor_callback to the render tick
+        self.state_changed = False
+        self.status_values = {}
+        self.status_texts = {}
+        self.cube_transform = np.eye(4)
 
         # Timer to update the views
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.update_views)
         self.timer.start(int(1000/65))  # ~65 fps
 
-    def add_quaternion(self, quaternion):
-        self.quaternion_store.append(quaternion)
-        if len(self.quaternion_store) > self.maxDataPoints:
-            self.quaternion_store = self.quaternion_store[-self.maxDataPoints:]
+    def add_quaternion(self, timestamp, quaternion):
+        self.quaternion_store.append(timestamp, quaternion)
 
-    def add_sensor_data(self, sensor_data):
-        self.sensor_store.append(sensor_data)
-        if len(self.sensor_store) > self.maxDataPoints:
-            self.sensor_store = self.sensor_store[-self.maxDataPoints:]
+    def add_sensor_data(self, timestamp, sensor_data):
+        self.sensor_store.append(timestamp, np.concatenate((sensor_data['gyro'], sensor_data['accel'], sensor_data['mag'])))
     
-    def add_euler_angles(self, euler_angles):
-        self.eulerAngles_store.append(euler_angles)
-        if len(self.eulerAngles_store) > self.maxDataPoints:
-            self.eulerAngles_store = self.eulerAngles_store[-self.maxDataPoints:]
+    def add_euler_angles(self, timestamp, euler_angles):
+        self.eulerAngles_store.append(timestamp, euler_angles)
     
     def update_views(self):
-        timestamps = np.array([data[0] for data in self.quaternion_store])
-        #quaternions = np.array([data[1] for data in self.quaternion_store])
+        timestamps, quaternions = self.quaternion_store.last(self.maxDataPoints)
         # Update the 3D view and the plot view if the data store is not empty
-        #if self.quaternion_store :
+        #if len(self.quaternion_store):
             #self.update_3d_view(quaternions[-1])
-            #self.update_3d_view_euler(self.eulerAngles_store[-1][1])
+            #self.update_3d_view_euler(self.eulerAngles_store.newest()[1])
             # self.update_plot_view(timestamps, quaternions)
-        if self.eulerAngles_store:
-            self.update_3d_view_euler(self.eulerAngles_store[-1][1])
-            #self.update_plot_view(timestamps, np.array([data[1] for data in self.quaternion_store]))
+        # Render only if fusion produced a new state since the last tick
+        if self.state_changed:
+            self.state_changed = False
+            self.update_3d_view_euler(self.eulerAngles_store.newest()[1])
+            self.update_status_view()
+            #self.update_plot_view(timestamps, quaternions)
 
 
     def sensor_callback(self, data):
@@ -71,11 +76,12 @@ class MainWindow(QtWidgets.QMainWindow):
         '''{'timestamp': 1247359183853915, 'gyro': array([-0.00045379, -0.00443314,  0.00246091]), 'accel': array([-0.03258987,  0.20892762,  9.802446  ]), 'mag': array([ 14.625 ,   5.75  , -39.0625])}'''
 
         # Store the sensor data
-        self.add_sensor_data((data['timestamp'], data))
+        self.add_sensor_data(data['timestamp'], data)
 
         #Find the time difference, in seconds, between the current and previous sensor data
         if len(self.sensor_store) > 1:
-            time_diff = (self.sensor_store[-1][0] - self.sensor_store[-2][0]) / 1e9
+            previous, current = self.sensor_store.times.last(2)
+            time_diff = (current - previous) / 1e9
         else:
             time_diff = 0
         
@@ -86,46 +92,31 @@ class MainWindow(QtWidgets.QMainWindow):
         # #Calculate the quaternion
         # quaternion = self.madgwick_filter.updateMARG(
         #     #get the latest quaternion
-        #     self.quaternion_store[-1][1] if self.quaternion_store else np.array([1., 0., 0., 0.]),
-        #     self.sensor_store[-1][1]['gyro'],
-        #     self.sensor_store[-1][1]['accel'],
-        #     self.sensor_store[-1][1]['mag'])       
+        #     self.quaternion_store.newest()[1] if len(self.quaternion_store) else np.array([1., 0., 0., 0.]),
+        #     data['gyro'],
+        #     data['accel'],
+        #     data['mag'])       
 
 
-        ahrs_data = self.ahrs_processor.process_sensor_data(
-        gyro=self.sensor_store[-1][1]['gyro'],
-        accel=self.sensor_store[-1][1]['accel'],
-        mag=self.sensor_store[-1][1]['mag'],
+        ahrs_output = self.ahrs_processor.update(
+        gyro=data['gyro'],
+        accel=data['accel'],
+        mag=data['mag'],
         timestamp=data['timestamp']
         )
 
 
         # Store the quaternion
-        #self.add_quaternion((data['timestamp'],  quaternion))
-
-        # Store the Euler angles
-        self.add_euler_angles((data['timestamp'], ahrs_data['euler_angles']))
-
-        self.cube.resetTransform()
-        # Apply rotations in sequence: Roll about X, Pitch about Y, Yaw about Z
-        self.cube.rotate(ahrs_data['euler_angles'][0], 1.0, 0.0, 0.0)  # Roll
-        self.cube.rotate(ahrs_data['euler_angles'][1], 0.0, 1.0, 0.0)  # Pitch
-        self.cube.rotate(ahrs_data['euler_angles'][2], 0.0, 0.0, 1.0)  # Yaw
-
+        #self.add_quaternion(data['timestamp'], quaternion)
 
+        # Store the Euler angles; the render tick picks up the newest state,
+        # so no Qt objects are touched at the sensor rate
+        self.add_euler_angles(data['timestamp'], ahrs_output.euler_angles)
+        for key in self.labels:
+            self.status_values[key] = getattr(ahrs_output, key)
+        self.state_changed = True
 
 
-        internal_states = ahrs_data['internal_states']
-        flags = ahrs_data['flags']
-        for key, label in self.labels.items():
-            if key in internal_states:
-                label.setText(str(internal_states[key]))
-            elif key in flags:
-                label.setText(str(flags[key]))
-        
-
-   
-
 
     def update_3d_view(self, quaternion):
         self.cube.resetTransform()
@@ -136,9 +127,22 @@ class MainWindow(QtWidgets.QMainWindow):
         self.gl_widget.update()
 
     def update_3d_view_euler(self, euler_angles):
-
+        # Same orientation as resetTransform() followed by rotate() about X (roll),
+        # Y (pitch) and Z (yaw): each rotate() is applied in front of the previous
+        # ones, giving Rz(yaw) @ Ry(pitch) @ Rx(roll), here as one precomputed matrix
+        roll, pitch, yaw = euler_angles
+        self.cube_transform[:3, :3] = euler_to_matrices(yaw, pitch, roll, degrees=True)[0]
+        self.cube.setTransform(pg.Transform3D(*self.cube_transform.flatten()))
         self.gl_widget.update()
 
+    def update_status_view(self):
+        # Only touch labels whose text changed
+        for key, value in self.status_values.items():
+            text = str(value)
+            if self.status_texts.get(key) != text:
+                self.status_texts[key] = text
+                self.labels[key].setText(text)
+
 
     def update_plot_view(self, timestamps, quaternions):
         self.curveQ0.setData(timestamps, quaternions[:, 0])
@@ -210,7 +214,7 @@ if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     loop = qasync.QEventLoop(app)
     asyncio.set_event_loop(loop)  
-    handler = SensorDataHandler("10.0.0.128:8080", ["android.sensor.accelerometer", "android.sensor.gyroscope", "android.sensor.magnetic_field"], debugLevel=0, notify_synchronously=True)
+    handler = SensorDataHandler("10.0.0.128:8080", ["android.sensor.accelerometer", "android.sensor.gyroscope", "android.sensor.magnetic_field"], debugLevel=0, trigger='gyro')
     window = MainWindow(handler, algorithm='AHRS')
     window.show()
     with loop:
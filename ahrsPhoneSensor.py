@@ -2,15 +2,44 @@ import json
 import numpy as np
 import asyncio
 import websockets
+from sensor_alignment import SensorAligner
+
+# orjson is optional, it decodes SensorServer messages several times faster than json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Key in latest_sensor_data for each Android sensor type
+SENSOR_KEYS = {
+    'android.sensor.gyroscope': 'gyro',
+    'android.sensor.accelerometer': 'accel',
+    'android.sensor.magnetic_field': 'mag',
+    'android.sensor.orientation': 'orientation',
+}
+
+# When merged sensor data is handed to the callbacks:
+#   'all'  - whenever every subscribed sensor has a value (the original behaviour)
+#   'gyro' - on every gyroscope sample, with the latest value of the other sensors
+#   'rate' - at a fixed rate in sensor time, with the latest value of every sensor
+TRIGGER_POLICIES = ('all', 'gyro', 'rate')
 
 class SensorDataHandler:
-    def __init__(self, address, sensors, debugLevel=0, notify_synchronously=False):
+    def __init__(self, address, sensors, debugLevel=0, notify_synchronously=False, loads=None, align=False,
+                 trigger='all', trigger_rate_hz=100, timestamp_scale=1e9):
+        if trigger not in TRIGGER_POLICIES:
+            raise ValueError(f"Unknown trigger policy {trigger!r}, expected one of {TRIGGER_POLICIES}")
         self.address = address
         self.sensors = sensors
         self.debugLevel = debugLevel
         self.ws = None
         self.callbacks = []
         self.notify_synchronously = notify_synchronously
+        self.loads = loads or json_loads
+        # Values are parsed straight into these buffers, which are reused for every
+        # message; callbacks that keep sensor values must copy them
+        self.buffers = {key: np.zeros(3) for key in SENSOR_KEYS.values()}
         self.latest_sensor_data = {
             'timestamp': None,
             'gyro': None,
@@ -18,37 +47,52 @@ class SensorDataHandler:
             'mag': None,
             'orientation': None,
         }
+        # Only the subscribed sensors have to be present before callbacks fire
+        self.required = [SENSOR_KEYS[sensor] for sensor in sensors if sensor in SENSOR_KEYS]
+        self.trigger = trigger
+        self.trigger_period = timestamp_scale / trigger_rate_hz
+        self.next_trigger = None
+        # With align=True every gyro sample becomes a frame with accel/mag
+        # interpolated onto its timestamp, instead of merging the latest values
+        self.aligner = None
+        if align:
+            subscribed = [SENSOR_KEYS[sensor] for sensor in sensors if sensor in SENSOR_KEYS]
+            self.aligner = SensorAligner(
+                interpolated=[key for key in ('accel', 'mag') if key in subscribed],
+                held=[key for key in ('orientation',) if key in subscribed],
+            )
 
     def log(self, message, level=1):
         if level <= self.debugLevel:
             print(message)
 
     async def on_message(self, message):
-        self.log(f"Message received: {message}", 2)
-        
-        data = json.loads(message)
-        sensor_type = data['type']
-        values = np.array(data['values'])
-        timestamp = data['timestamp']
+        # Only format log messages when their level is enabled
+        if self.debugLevel >= 2:
+            self.log(f"Message received: {message}", 2)
 
-        if sensor_type == 'android.sensor.gyroscope':
-            self.log(f"gyro data: {data}", 3)
-            self.latest_sensor_data['gyro'] = values
-        elif sensor_type == 'android.sensor.accelerometer':
-            self.log(f"accel data: {data}", 3)
-            self.latest_sensor_data['accel'] = values
-        elif sensor_type == 'android.sensor.magnetic_field':
-            self.log(f"mag data: {data}", 3)
-            self.latest_sensor_data['mag'] = values
-        elif sensor_type == 'android.sensor.orientation':
-            self.log(f"orientation data: {data}", 3)
-            self.latest_sensor_data['orientation'] = values
-        
-        self.latest_sensor_data['timestamp'] = timestamp
+        data = self.loads(message)
+        key = SENSOR_KEYS.get(data['type'])
+        if key is not None:
+            buffer = self.buffers[key]
+            buffer[:] = data['values']
+            self.latest_sensor_data[key] = buffer
+            if self.debugLevel >= 3:
+                self.log(f"{key} data: {data}", 3)
 
-        if all(self.latest_sensor_data[key] is not None for key in ['gyro', 'accel', 'mag', 'orientation']):
+        if self.aligner:
+            if key is not None:
+                self.aligner.add(key, data['timestamp'], buffer)
+            for frame in self.aligner.frames():
+                await self.notify_callbacks(frame)
+            return
+
+        self.latest_sensor_data['timestamp'] = data['timestamp']
+
+        if self.should_trigger(key, data['timestamp']):
             await self.notify_callbacks(self.latest_sensor_data)
-            if self.notify_synchronously:
+            # Waiting for a full refresh only makes sense for the 'all' policy
+            if self.notify_synchronously and self.trigger == 'all':
                 self.latest_sensor_data = {
                     'timestamp': None,
                     'gyro': None,
@@ -57,6 +101,23 @@ class SensorDataHandler:
                     'orientation': None,
                 }
 
+    def should_trigger(self, key, timestamp):
+        """ Decide, according to the trigger policy, whether this message fires the callbacks """
+        if any(self.latest_sensor_data[required] is None for required in self.required):
+            return False
+        if self.trigger == 'gyro':
+            return key == 'gyro'
+        if self.trigger == 'rate':
+            # Restart the schedule on the first frame or after falling more than a period behind
+            if self.next_trigger is None or timestamp >= self.next_trigger + self.trigger_period:
+                self.next_trigger = timestamp + self.trigger_period
+                return True
+            if timestamp >= self.next_trigger:
+                self.next_trigger += self.trigger_period
+                return True
+            return False
+        return True
+
     async def notify_callbacks(self, data):
         for callback in self.callbacks:
             if asyncio.iscoroutinefunction(callback):
@@ -1,6 +1,52 @@
 import imufusion
 import numpy as np
 
+INTERNAL_STATE_FIELDS = (
+    'acceleration_error',
+    'accelerometer_ignored',
+    'acceleration_recovery_trigger',
+    'magnetic_error',
+    'magnetometer_ignored',
+    'magnetic_recovery_trigger',
+)
+FLAG_FIELDS = (
+    'initialising',
+    'angular_rate_recovery',
+    'acceleration_recovery',
+    'magnetic_recovery',
+)
+BOOLEAN_INTERNAL_STATES = ('accelerometer_ignored', 'magnetometer_ignored')
+
+class AhrsOutput:
+    """Reusable output record of AhrsProcessor.update, overwritten in place on every sample."""
+    __slots__ = ('timestamp', 'quaternion', 'euler_angles', 'orientation') + INTERNAL_STATE_FIELDS + FLAG_FIELDS
+
+    def __init__(self):
+        self.timestamp = None
+        self.quaternion = np.array([1.0, 0.0, 0.0, 0.0])
+        self.euler_angles = np.zeros(3)
+        self.orientation = None
+        for key in INTERNAL_STATE_FIELDS:
+            setattr(self, key, False if key in BOOLEAN_INTERNAL_STATES else 0.0)
+        for key in FLAG_FIELDS:
+            setattr(self, key, False)
+
+    def to_dict(self):
+        """ Return a standalone copy in the dict layout of process_sensor_data """
+        output_data = {
+            'timestamp': self.timestamp,
+            'quaternion': self.quaternion.copy(),
+            'euler_angles': self.euler_angles.copy(),
+            'internal_states': {key: getattr(self, key) for key in INTERNAL_STATE_FIELDS},
+            'flags': {key: getattr(self, key) for key in FLAG_FIELDS}
+        }
+
+        if self.orientation is not None:
+            output_data['orientation'] = self.orientation
+
+        return output_data
+
+
 class AhrsProcessor:
     def __init__(self, sample_rate=5, gain=0.5, gyroscope_range=2000, acceleration_rejection=100, magnetic_rejection=100, recovery_trigger_period=5*10):
         self.sample_rate = sample_rate
@@ -24,10 +70,19 @@ class AhrsProcessor:
         except TypeError as e:
             print(f"Error initializing settings: {e}")
 
-    def process_sensor_data(self, gyro, accel, mag, orientation = None, timestamp = None):
-        
-    
+        # Preallocated unit conversion buffers and output record for update()
+        self._gyro_degrees = np.zeros(3)
+        self._accel_g = np.zeros(3)
+        self._mag = np.zeros(3)
+        self.output = AhrsOutput()
 
+    def update(self, gyro, accel, mag, orientation = None, timestamp = None):
+        """
+        Update the AHRS algorithm with one sample and fill the reusable output record.
+        Unit conversions are done in place into preallocated buffers, so the returned
+        AhrsOutput is the same object on every call and is overwritten by the next one.
+        Use process_sensor_data (or AhrsOutput.to_dict) when a standalone dict is needed.
+        """
         # Calculate delta time
         if not hasattr(self, 'last_timestamp'):
             self.last_timestamp = timestamp
@@ -36,46 +91,104 @@ class AhrsProcessor:
             delta_time = timestamp - self.last_timestamp
             self.last_timestamp = timestamp
 
-        # Apply offset to gyroscope data
-        gyro_to_degree = gyro * (180 / np.pi)
-        corrected_gyro = self.offset.update(np.array(gyro_to_degree))
+        # Convert units in place: rad/s to degrees/s and m/s^2 to g
+        np.multiply(gyro, 180 / np.pi, out=self._gyro_degrees)
+        np.divide(accel, 9.80665, out=self._accel_g)
+        np.copyto(self._mag, mag)
 
-        # Update AHRS algorithm with current sensor data
-        self.ahrs.update(corrected_gyro, np.array(accel)/9.80665, np.array(mag), delta_time)
+        # Apply offset to gyroscope data and update AHRS algorithm
+        corrected_gyro = self.offset.update(self._gyro_degrees)
+        self.ahrs.update(corrected_gyro, self._accel_g, self._mag, delta_time)
 
-        # Get the quaternion and convert to Euler angles
+        # Copy the quaternion and Euler angles (degrees) into the output record
+        output = self.output
         quaternion = self.ahrs.quaternion
-        euler_angles = quaternion.to_euler()  # Returns Euler angles in degrees
-        quaternion_matrix =  np.array(quaternion.wxyz) 
-        
-       
+        output.timestamp = timestamp
+        output.quaternion[:] = quaternion.wxyz
+        output.euler_angles[:] = quaternion.to_euler()
+        output.orientation = orientation
 
         # Retrieve internal states and flags
         internal_states = self.ahrs.internal_states
+        output.acceleration_error = internal_states.acceleration_error
+        output.accelerometer_ignored = internal_states.accelerometer_ignored
+        output.acceleration_recovery_trigger = internal_states.acceleration_recovery_trigger
+        output.magnetic_error = internal_states.magnetic_error
+        output.magnetometer_ignored = internal_states.magnetometer_ignored
+        output.magnetic_recovery_trigger = internal_states.magnetic_recovery_trigger
+
         flags = self.ahrs.flags
+        output.initialising = flags.initialising
+        output.angular_rate_recovery = flags.angular_rate_recovery
+        output.acceleration_recovery = flags.acceleration_recovery
+        output.magnetic_recovery = flags.magnetic_recovery
+
+        return output
+
+    def process_sensor_data(self, gyro, accel, mag, orientation = None, timestamp = None):
+        """ Update the AHRS algorithm with one sample and return the output as a new dict """
+        return self.update(gyro, accel, mag, orientation, timestamp).to_dict()
+
+    def process_batch(self, gyro, accel, mag, timestamps, orientation=None):
+        """
+        Run the AHRS algorithm over a whole recording in one call.
+        Gives the same results as calling process_sensor_data once per row, but
+        converts units for all samples up front and writes into preallocated arrays
+        instead of building a dict per sample.
+        :param gyro: [N, 3] gyroscope samples in rad/s.
+        :param accel: [N, 3] accelerometer samples in m/s^2.
+        :param mag: [N, 3] magnetometer samples.
+        :param timestamps: [N] timestamps, in the same unit as process_sensor_data.
+        :param orientation: Optional [N, 3] orientation samples passed through to the output.
+        :return: Dict with the same keys as process_sensor_data, each holding one row per sample.
+        """
+        timestamps = np.asarray(timestamps)
+        sample_count = len(timestamps)
+        gyro_degrees = np.asarray(gyro, dtype=float) * (180 / np.pi)
+        accel_g = np.asarray(accel, dtype=float) / 9.80665
+        mag = np.ascontiguousarray(mag, dtype=float)
+
+        # Delta times continue from the last sample seen by either path
+        delta_times = np.zeros(sample_count)
+        if sample_count:
+            if hasattr(self, 'last_timestamp'):
+                delta_times[0] = timestamps[0] - self.last_timestamp
+            delta_times[1:] = np.diff(timestamps)
+            self.last_timestamp = timestamps[-1]
+
+        quaternions = np.empty((sample_count, 4))
+        euler_angles = np.empty((sample_count, 3))
+        internal_states = {
+            key: np.empty(sample_count, dtype=bool if key in BOOLEAN_INTERNAL_STATES else float)
+            for key in INTERNAL_STATE_FIELDS
+        }
+        flags = {key: np.empty(sample_count, dtype=bool) for key in FLAG_FIELDS}
+
+        ahrs = self.ahrs
+        offset = self.offset
+        for i in range(sample_count):
+            ahrs.update(offset.update(gyro_degrees[i]), accel_g[i], mag[i], delta_times[i])
+
+            quaternion = ahrs.quaternion
+            quaternions[i] = quaternion.wxyz
+            euler_angles[i] = quaternion.to_euler()
+
+            sample_states = ahrs.internal_states
+            for key in INTERNAL_STATE_FIELDS:
+                internal_states[key][i] = getattr(sample_states, key)
+            sample_flags = ahrs.flags
+            for key in FLAG_FIELDS:
+                flags[key][i] = getattr(sample_flags, key)
 
-        # Package output data
         output_data = {
-            'timestamp': timestamp,
-            'quaternion': quaternion_matrix,
+            'timestamp': timestamps,
+            'quaternion': quaternions,
             'euler_angles': euler_angles,
-            'internal_states': {
-                'acceleration_error': internal_states.acceleration_error,
-                'accelerometer_ignored': internal_states.accelerometer_ignored,
-                'acceleration_recovery_trigger': internal_states.acceleration_recovery_trigger,
-                'magnetic_error': internal_states.magnetic_error,
-                'magnetometer_ignored': internal_states.magnetometer_ignored,
-                'magnetic_recovery_trigger': internal_states.magnetic_recovery_trigger
-            },
-            'flags': {
-                'initialising': flags.initialising,
-                'angular_rate_recovery': flags.angular_rate_recovery,
-                'acceleration_recovery': flags.acceleration_recovery,
-                'magnetic_recovery': flags.magnetic_recovery
-            }
+            'internal_states': internal_states,
+            'flags': flags
         }
 
         if orientation is not None:
-            output_data['orientation'] = orientation
+            output_data['orientation'] = np.asarray(orientation)
 
         return output_data
@@ -1,97 +1,189 @@
 import asyncio
 import websockets
-import numpy as np
-import json
-import math
-from ahrsPhoneSensor import SensorDataHandler
-from ahrs_Mad import AhrsProcessor
-from euler_serial import EulerSerial
-
-class NumpyEncoder(json.JSONEncoder):
-    """ Custom encoder for numpy data types """
-    def default(self, obj):
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return json.JSONEncoder.default(self, obj)
+from urllib.parse import urlparse, parse_qs
+from device_sources import DeviceSource
+from fusion_pool import FusionPool
+from broadcast_fanout import ClientChannel
+from frame_codec import encode_frame
+from subscriptions import Subscription, SubscriptionStream
 
 class SensorDataServer:
-    def __init__(self, address, port, data_source="phone"):
-        self.data_source = data_source
-        self.clients = set()
+    """
+    Fuses one or more devices and broadcasts the results to websocket clients.
+
+    With devices=None the server reads a single device described by data_source
+    and the other original arguments. Otherwise devices is a list of
+    DeviceSource.from_config dicts, e.g.
+        [{"id": "phone", "source": "phone", "address": "10.0.0.46:8080"},
+         {"id": "imu0", "source": "serial", "address": "/dev/ttyACM0", "serial_protocol": "binary"}]
+    Each device has its own AhrsProcessor, and its frames carry its id.
+
+    With fusion_workers > 0 the AHRS updates run in that many worker processes
+    (see FusionPool) while ingest and broadcast stay on the event loop.
+    """
+    def __init__(self, address, port, data_source="phone", record_path=None, replay_speed=1.0, timestamp_scale=1e9,
+                 queue_policy="drop_oldest", max_queue=64, serial_protocol="ascii", serial_port="/dev/ttyACM1",
+                 devices=None, yield_every=64, fusion_workers=0):
+        # Connected websocket -> ClientChannel with its own bounded send queue
+        self.clients = {}
+        # Subscription -> SubscriptionStream of the clients sharing it
+        self.streams = {}
+        self.queue_policy = queue_policy
+        self.max_queue = max_queue
         self.port = port
-        self.ahrs_processor = AhrsProcessor(
-            sample_rate=1000, gain=0.041, gyroscope_range=2000,
-            acceleration_rejection=10, magnetic_rejection=10, recovery_trigger_period=5*1000
-        )
-
-        if self.data_source == "phone":
-            self.handler = SensorDataHandler(
-                address, 
-                ["android.sensor.accelerometer", "android.sensor.gyroscope", "android.sensor.magnetic_field", "android.sensor.orientation"],
-                debugLevel=0, notify_synchronously=True
-            )
-            self.handler.add_callback(self.process_and_broadcast)
-        elif self.data_source == "serial":
-            self.handler = EulerSerial('/dev/ttyACM1', baud_rate=921600)
-            self.handler.set_on_data_handler(self.process_and_broadcast)
+
+        if devices is None:
+            device = {'id': data_source, 'source': data_source, 'address': address, 'record_path': record_path}
+            if data_source == "serial":
+                device.update(address=serial_port, serial_protocol=serial_protocol)
+            elif data_source == "replay":
+                # address is the path of a SensorRecorder recording
+                device.update(replay_speed=replay_speed, timestamp_scale=timestamp_scale)
+            devices = [device]
+
+        # Device id -> DeviceSource, in the order given
+        self.devices = {}
+        for index, config in enumerate(devices):
+            device = DeviceSource.from_config(index, config, self.broadcast_frame, yield_every)
+            if device.id in self.devices:
+                raise ValueError(f"Duplicate device id {device.id!r}")
+            self.devices[device.id] = device
+
+        # The first device, for code written against the single device server
+        self.default_device = next(iter(self.devices.values()))
+        self.data_source = self.default_device.source
+        self.handler = self.default_device.handler
+        self.ahrs_processor = self.default_device.ahrs_processor
+        self.recorder = self.default_device.recorder
+
+        self.fusion_pool = FusionPool(fusion_workers) if fusion_workers else None
+        for device in self.devices.values():
+            device.fusion_pool = self.fusion_pool
 
     async def process_and_broadcast(self, data):
-        # Process data with AHRS algorithm, if the data source is serial, add orientation data to the data dictionary
-       # Ensure the data is converted to NumPy arrays
-        gyro = np.array(data['gyro'], dtype=float)
-        accel = np.array(data['accel'], dtype=float)
-        mag = np.array(data['mag'], dtype=float)
-        orientation = np.array(data.get('orientation', [0, 0, 0]), dtype=float)  # Default to [0, 0, 0] if not present
-        
-        #If data source is serial divide the timestamp by 1e6 if it is phone data source then divide by 1e9
-        if self.data_source == "serial":
-            timestamp = data['timestamp'] / 1e6
-        elif self.data_source == "phone":
-            timestamp = data['timestamp'] / 1e9
-
-        ahrs_data = self.ahrs_processor.process_sensor_data(
-            gyro,
-            accel,
-            mag,
-            orientation,
-            timestamp,
-        )
-        # Use the custom JSON encoder
-        message = json.dumps(ahrs_data, cls=NumpyEncoder)
-        await self.broadcast(message)
+        await self.default_device.process_and_broadcast(data)
+
+    async def process_batch_and_broadcast(self, batch):
+        await self.default_device.process_batch_and_broadcast(batch)
+
+    def encode_frame(self, output, subscription, device):
+        return encode_frame(output, subscription.wire_format, device.sequence, subscription.fields,
+                            device.id, device.index)
+
+    async def broadcast_frame(self, output, device=None):
+        device = device or self.default_device
+        # Encode the frame once per distinct subscription, not once per client
+        for stream in self.streams.values():
+            frame = stream.offer(output, device.id)
+            if frame is None:
+                continue
+            message = self.encode_frame(frame, stream.subscription, device)
+            for channel in stream.channels:
+                channel.put(message)
 
     async def broadcast(self, message):
-        # Broadcast message to all connected WebSocket clients
-        if self.clients:  # Check if there are any connected clients
-            print(f"Broadcasting message: {message}")
-            await asyncio.wait([client.send(message) for client in self.clients])
+        # Queue the message for every connected client; the per-client writer
+        # tasks do the sending, so fusion never waits on the network
+        for channel in self.clients.values():
+            channel.put(message)
+
+    async def register(self, websocket, policy=None, subscription=None):
+        channel = ClientChannel(websocket, self.max_queue, policy or self.queue_policy)
+        self.clients[websocket] = channel
+        self.subscribe(channel, subscription or Subscription())
 
-    async def register(self, websocket):
-        self.clients.add(websocket)
+    def subscribe(self, channel, subscription):
+        """ Move a client to the stream of its (new) subscription """
+        if channel.subscription is not None:
+            self.leave_stream(channel)
+        stream = self.streams.get(subscription)
+        if stream is None:
+            stream = self.streams[subscription] = SubscriptionStream(subscription)
+        stream.channels.add(channel)
+        channel.subscription = subscription
+
+    def leave_stream(self, channel):
+        stream = self.streams[channel.subscription]
+        stream.channels.discard(channel)
+        if not stream.channels:
+            del self.streams[channel.subscription]
 
     async def unregister(self, websocket):
-        self.clients.discard(websocket)
+        channel = self.clients.pop(websocket, None)
+        if channel:
+            self.leave_stream(channel)
+            await channel.close()
+            print(f"Client disconnected: {channel.stats()}")
+
+    def device_stats(self):
+        """ Fused frame counts per device """
+        return [device.stats() for device in self.devices.values()]
+
+    def client_stats(self):
+        """ Sent, dropped and queued frame counts per connected client """
+        return [channel.stats() for channel in self.clients.values()]
+
+    async def websocket_handler(self, websocket, path=None):
+        # websockets >= 13 passes only the connection; older versions also pass the path
+        if path is None:
+            path = websocket.request.path
+        # Clients may choose their queue policy and wire format in the URL,
+        # e.g. ws://host:5678/?policy=latest&format=binary
+        query = parse_qs(urlparse(path).query)
+        policy = query.get("policy", [None])[0]
+        wire_format = query.get("format", ["json"])[0]
 
-    async def websocket_handler(self, websocket, path):
         # Register websocket connection
-        await self.register(websocket)
         try:
-            await websocket.wait_closed()
+            await self.register(websocket, policy, Subscription(wire_format))
+        except ValueError as e:
+            await websocket.close(code=1008, reason=str(e))
+            return
+        try:
+            # Text messages from the client replace its subscription, see Subscription
+            async for message in websocket:
+                channel = self.clients[websocket]
+                try:
+                    self.subscribe(channel, Subscription.from_message(message, channel.subscription))
+                except (ValueError, TypeError) as e:
+                    # json.JSONDecodeError is a ValueError too
+                    print(f"Rejected subscription {message!r}: {e}")
+        except websockets.ConnectionClosed:
+            pass
         finally:
             await self.unregister(websocket)
 
     async def main(self):
-        # Start the sensor handler connection based on the data source
-        if self.data_source == "phone":
-            asyncio.create_task(self.handler.connect())
-        elif self.data_source == "serial":
-            await self.handler.start_reading()
+        # Resolves only if fusion fails, e.g. when a FusionPool worker dies
+        fusion_failed = asyncio.Future()
+        try:
+            if self.fusion_pool:
+                self.fusion_pool.start()
+                fusion_failed = asyncio.create_task(self.fusion_pool.dispatch(list(self.devices.values())))
+
+            # Start reading every device
+            for device in self.devices.values():
+                await device.start()
+
+            # Start the WebSocket server
+            async with websockets.serve(self.websocket_handler, "localhost", self.port):
+                await fusion_failed  # Run forever
+        finally:
+            await self.close()
 
-        # Start the WebSocket server
-        async with websockets.serve(self.websocket_handler, "localhost", self.port):
-            await asyncio.Future()  # Run forever
+    async def close(self):
+        """ Stop the devices, write out what their recorders still hold and stop the fusion workers """
+        for device in self.devices.values():
+            await device.close()
+        if self.fusion_pool:
+            self.fusion_pool.close()
 
 if __name__ == "__main__":
     # Example usage
     server = SensorDataServer("10.0.0.46:8080", 5678, data_source="phone")  # Change data_source to "phone" if needed
+    # Several devices at once:
+    # server = SensorDataServer(None, 5678, devices=[
+    #     {"id": "phone", "source": "phone", "address": "10.0.0.46:8080"},
+    #     {"id": "imu0", "source": "serial", "address": "/dev/ttyACM0"},
+    # ])
     asyncio.run(server.main())
@@ -0,0 +1,83 @@
+"""
+Messages/sec of ahrsPhoneSensor.SensorDataHandler.on_message before and after the
+fast decode path (preallocated buffers, lazy logging, optional orjson backend).
+
+Usage:
+    python benchmark_decode.py --messages 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from ahrsPhoneSensor import SensorDataHandler
+from benchmark_pipeline import PHONE_SENSORS, make_messages
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class LegacySensorDataHandler(SensorDataHandler):
+    """ The previous on_message, kept as the 'before' reference """
+    async def on_message(self, message):
+        self.log(f"Message received: {message}", 2)
+
+        data = json.loads(message)
+        sensor_type = data['type']
+        values = np.array(data['values'])
+        timestamp = data['timestamp']
+
+        if sensor_type == 'android.sensor.gyroscope':
+            self.log(f"gyro data: {data}", 3)
+            self.latest_sensor_data['gyro'] = values
+        elif sensor_type == 'android.sensor.accelerometer':
+            self.log(f"accel data: {data}", 3)
+            self.latest_sensor_data['accel'] = values
+        elif sensor_type == 'android.sensor.magnetic_field':
+            self.log(f"mag data: {data}", 3)
+            self.latest_sensor_data['mag'] = values
+        elif sensor_type == 'android.sensor.orientation':
+            self.log(f"orientation data: {data}", 3)
+            self.latest_sensor_data['orientation'] = values
+
+        self.latest_sensor_data['timestamp'] = timestamp
+
+        if all(self.latest_sensor_data[key] is not None for key in ['gyro', 'accel', 'mag', 'orientation']):
+            await self.notify_callbacks(self.latest_sensor_data)
+
+
+async def measure(handler, messages):
+    on_message = handler.on_message
+    start = time.perf_counter()
+    for message in messages:
+        await on_message(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+async def run_benchmark(message_count=100000):
+    messages = make_messages(message_count)
+    variants = [
+        ('before (json, np.array per message)', LegacySensorDataHandler('', PHONE_SENSORS)),
+        ('after (json, preallocated buffers)', SensorDataHandler('', PHONE_SENSORS, loads=json.loads)),
+    ]
+    if orjson is not None:
+        variants.append(('after (orjson, preallocated buffers)', SensorDataHandler('', PHONE_SENSORS, loads=orjson.loads)))
+
+    results = {}
+    for name, handler in variants:
+        await measure(handler, messages[:1000])  # Warm up
+        results[name] = await measure(handler, messages)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SensorDataHandler message decoding")
+    parser.add_argument('--messages', type=int, default=100000)
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.messages))
+    baseline = next(iter(results.values()))
+    for name, rate in results.items():
+        print(f"{name:<40} {rate:10.0f} messages/s  ({rate / baseline:.2f}x)")
@@ -0,0 +1,80 @@
+"""
+Fused frames/s of in-process AHRS fusion against FusionPool worker processes,
+for several devices fed in chunks as EulerSerial batches would arrive.
+Worker start-up is excluded; on a machine with fewer cores than workers the
+pool cannot be faster than in-process fusion.
+
+Usage:
+    python benchmark_fusion.py --devices 4 --workers 1 2 4 --samples 20000
+"""
+import argparse
+import os
+import time
+import numpy as np
+from device_sources import make_ahrs_processor
+from fusion_pool import FusionPool
+from sensor_server_sim import synthesize
+
+
+def make_samples(count, rate_hz=1000):
+    t = np.arange(count) / rate_hz
+    gyro = np.array([synthesize("android.sensor.gyroscope", x) for x in t])
+    accel = np.array([synthesize("android.sensor.accelerometer", x) for x in t])
+    mag = np.array([synthesize("android.sensor.magnetic_field", x) for x in t])
+    return t, gyro, accel, mag
+
+
+def run_in_process(samples, device_count, chunk):
+    t, gyro, accel, mag = samples
+    processors = [make_ahrs_processor() for _ in range(device_count)]
+    start = time.perf_counter()
+    for i in range(0, len(t), chunk):
+        for processor in processors:
+            processor.process_batch(gyro[i:i + chunk], accel[i:i + chunk], mag[i:i + chunk], t[i:i + chunk])
+    return device_count * len(t) / (time.perf_counter() - start)
+
+
+def run_pool(samples, device_count, worker_count, chunk):
+    t, gyro, accel, mag = samples
+    expected = device_count * len(t)
+    pool = FusionPool(worker_count, capacity=max(4 * chunk * device_count, 8192))
+    pool.start()
+    # Wait until every worker has started and fused a first sample
+    for device in range(device_count):
+        pool.submit_batch(device, t[:1], gyro[:1], accel[:1], mag[:1])
+    received = 0
+    while received < device_count:
+        received += sum(len(block) for block in pool.collect())
+        time.sleep(0.001)
+
+    received = 0
+    start = time.perf_counter()
+    for i in range(0, len(t), chunk):
+        for device in range(device_count):
+            # Continue after the warm-up sample so delta times stay positive
+            pool.submit_batch(device, t[i:i + chunk] + 1, gyro[i:i + chunk], accel[i:i + chunk], mag[i:i + chunk])
+        received += sum(len(block) for block in pool.collect())
+    while received < expected - pool.dropped:
+        received += sum(len(block) for block in pool.collect())
+        time.sleep(0.0005)
+    rate = received / (time.perf_counter() - start)
+    dropped = pool.dropped
+    pool.close()
+    return rate, dropped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark in-process fusion against FusionPool workers")
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--samples', type=int, default=20000, help="Samples per device")
+    parser.add_argument('--chunk', type=int, default=64, help="Samples per submitted batch")
+    args = parser.parse_args()
+
+    samples = make_samples(args.samples)
+    print(f"{args.devices} devices x {args.samples} samples, {os.cpu_count()} CPUs")
+    baseline = run_in_process(samples, args.devices, args.chunk)
+    print(f"  in process      {baseline:10.0f} frames/s")
+    for worker_count in args.workers:
+        rate, dropped = run_pool(samples, args.devices, worker_count, args.chunk)
+        print(f"  {worker_count} worker(s)     {rate:10.0f} frames/s  ({rate / baseline:.2f}x, {dropped} dropped)")
@@ -0,0 +1,244 @@
+"""
+End-to-end benchmark of the phone fusion pipeline:
+SensorDataHandler.on_message -> notify_callbacks -> AhrsProcessor.update
+-> SensorDataServer.broadcast_frame, driven by synthetic SensorServer messages.
+
+Usage:
+    python benchmark_pipeline.py --messages 20000 --output benchmark_results/run.json
+    python benchmark_pipeline.py --format binary
+    python benchmark_pipeline.py --baseline benchmark_results/run.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from ahrs_emit import SensorDataServer
+from frame_codec import WIRE_FORMATS
+from subscriptions import Subscription
+from sensor_server_sim import synthesize
+
+PHONE_SENSORS = [
+    "android.sensor.accelerometer",
+    "android.sensor.gyroscope",
+    "android.sensor.magnetic_field",
+    "android.sensor.orientation",
+]
+
+
+def make_messages(count, sensors=PHONE_SENSORS, rate_hz=1000):
+    """ Pre-encode SensorServer JSON messages, cycling through the sensors """
+    messages = []
+    for i in range(count):
+        sensor_type = sensors[i % len(sensors)]
+        t = (i // len(sensors)) / rate_hz
+        messages.append(json.dumps({"type": sensor_type, "values": synthesize(sensor_type, t), "timestamp": int(t * 1e9)}))
+    return messages
+
+
+class CountingClient:
+    """ Stand-in for a connected websocket that only counts what it is sent """
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    async def send(self, message):
+        self.messages += 1
+        self.bytes += len(message)
+
+
+class StageTimer:
+    """ Wraps functions and records their durations in nanoseconds """
+    def __init__(self):
+        self.samples = {}
+
+    def wrap(self, name, func):
+        samples = self.samples.setdefault(name, [])
+        if asyncio.iscoroutinefunction(func):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter_ns()
+                result = await func(*args, **kwargs)
+                samples.append(time.perf_counter_ns() - start)
+                return result
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter_ns()
+                result = func(*args, **kwargs)
+                samples.append(time.perf_counter_ns() - start)
+                return result
+        return timed
+
+
+def latency_stats(samples_ns):
+    samples_us = np.asarray(samples_ns, dtype=float) / 1e3
+    if len(samples_us) == 0:
+        return {'count': 0}
+    return {
+        'count': int(len(samples_us)),
+        'p50_us': float(np.percentile(samples_us, 50)),
+        'p99_us': float(np.percentile(samples_us, 99)),
+        'mean_us': float(samples_us.mean()),
+    }
+
+
+async def build_server(client_count, wire_format="json"):
+    server = SensorDataServer("127.0.0.1:0", 0, data_source="phone")
+    clients = [CountingClient() for _ in range(client_count)]
+    for client in clients:
+        await server.register(client, subscription=Subscription(wire_format))
+    return server, clients
+
+
+async def run_throughput(messages, client_count, wire_format="json"):
+    """ Time the whole pipeline and each stage, without allocation tracing """
+    server, clients = await build_server(client_count, wire_format)
+    handler = server.handler
+    timer = StageTimer()
+    server.ahrs_processor.update = timer.wrap('fusion', server.ahrs_processor.update)
+    server.encode_frame = timer.wrap('encode', server.encode_frame)
+    # The device holds its own reference to broadcast_frame, so wrap that one
+    device = server.default_device
+    device.broadcast = timer.wrap('broadcast_frame', device.broadcast)
+    # Callbacks were registered before wrapping, so re-register the timed version
+    handler.callbacks = [timer.wrap('process_and_broadcast', server.process_and_broadcast)]
+    callback_ns = timer.samples['process_and_broadcast']
+    end_to_end = []
+    decode = []
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for i, message in enumerate(messages):
+            callbacks_before = len(callback_ns)
+            message_start = time.perf_counter_ns()
+            await handler.on_message(message)
+            total = time.perf_counter_ns() - message_start
+            end_to_end.append(total)
+            # Decode is on_message minus the callbacks it triggered
+            decode.append(total - sum(callback_ns[callbacks_before:]))
+            if i % 100 == 99:
+                await asyncio.sleep(0)  # Let the client writer tasks run, as a socket read would
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0)
+
+    samples = timer.samples
+    fused = len(samples['fusion'])
+    # All clients share one subscription, so there is at most one encode per frame;
+    # broadcast is broadcast_frame minus that encode
+    broadcast = np.asarray(samples['broadcast_frame'], dtype=float)
+    if client_count:
+        broadcast -= np.asarray(samples['encode'], dtype=float)
+
+    return {
+        'messages': len(messages),
+        'fused_frames': fused,
+        'elapsed_s': elapsed,
+        'messages_per_s': len(messages) / elapsed,
+        'fused_frames_per_s': fused / elapsed,
+        'wire_format': wire_format,
+        'bytes_sent_per_client': clients[0].bytes if clients else 0,
+        'client_stats': server.client_stats(),
+        'stages': {
+            'end_to_end': latency_stats(end_to_end),
+            'decode': latency_stats(decode),
+            'fusion': latency_stats(samples['fusion']),
+            'encode': latency_stats(samples['encode']),
+            'broadcast': latency_stats(broadcast),
+        },
+    }
+
+
+async def run_allocations(messages, client_count, wire_format="json"):
+    """ Measure memory allocated per message with tracemalloc in a separate pass """
+    server, _ = await build_server(client_count, wire_format)
+    handler = server.handler
+    # Warm up so one-time allocations (imports, caches, first AHRS state) are excluded
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for message in messages[:100]:
+            await handler.on_message(message)
+
+        tracemalloc.start()
+        blocks_before = sys.getallocatedblocks()
+        transient_bytes = 0
+        for message in messages:
+            tracemalloc.reset_peak()
+            current_before, _ = tracemalloc.get_traced_memory()
+            await handler.on_message(message)
+            _, peak = tracemalloc.get_traced_memory()
+            transient_bytes += peak - current_before
+        blocks_after = sys.getallocatedblocks()
+        tracemalloc.stop()
+
+    return {
+        'peak_bytes_per_message': transient_bytes / len(messages),
+        'retained_blocks_per_message': (blocks_after - blocks_before) / len(messages),
+    }
+
+
+def compare_results(current, baseline, tolerance=0.10):
+    """ Return human readable regressions of current against a baseline result """
+    regressions = []
+    if current['messages_per_s'] < baseline['messages_per_s'] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['messages_per_s']:.0f} -> {current['messages_per_s']:.0f} msg/s")
+    for stage, stats in current['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base and 'p99_us' in stats and 'p99_us' in base and stats['p99_us'] > base['p99_us'] * (1 + tolerance):
+            regressions.append(f"{stage} p99 {base['p99_us']:.1f} -> {stats['p99_us']:.1f} us")
+    base_alloc = baseline.get('allocations', {}).get('peak_bytes_per_message')
+    if base_alloc and current['allocations']['peak_bytes_per_message'] > base_alloc * (1 + tolerance):
+        regressions.append(f"allocations {base_alloc:.0f} -> {current['allocations']['peak_bytes_per_message']:.0f} bytes/msg")
+    return regressions
+
+
+def print_results(results):
+    print(f"{results['messages']} messages, {results['fused_frames']} fused frames in {results['elapsed_s']:.3f} s")
+    print(f"  {results['messages_per_s']:.0f} messages/s, {results['fused_frames_per_s']:.0f} fused frames/s")
+    for stage, stats in results['stages'].items():
+        if stats['count']:
+            print(f"  {stage:<11} p50 {stats['p50_us']:8.1f} us   p99 {stats['p99_us']:8.1f} us")
+    allocations = results['allocations']
+    print(f"  allocations: {allocations['peak_bytes_per_message']:.0f} bytes/message peak, "
+          f"{allocations['retained_blocks_per_message']:.3f} blocks/message retained")
+
+
+async def run_benchmark(message_count=20000, client_count=1, wire_format="json"):
+    messages = make_messages(message_count)
+    results = await run_throughput(messages, client_count, wire_format)
+    results['allocations'] = await run_allocations(messages[:min(message_count, 5000)], client_count, wire_format)
+    results['clients'] = client_count
+    results['python'] = platform.python_version()
+    results['machine'] = platform.machine()
+    results['created'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the phone -> AHRS -> broadcast pipeline")
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=1)
+    parser.add_argument('--format', default='json', choices=WIRE_FORMATS, help="Wire format of the clients")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this path")
+    parser.add_argument('--baseline', default=None, help="Compare against a previous JSON result")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.messages, args.clients, args.format))
+    print_results(results)
+
+    output = args.output or os.path.join('benchmark_results', f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
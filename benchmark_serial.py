@@ -0,0 +1,167 @@
+"""
+EulerSerial benchmark on a pseudo-terminal firmware emulator (serial_loopback.py):
+  - maximum sustained parse rate with the emulator writing as fast as it can
+  - producer to consumer lag at a fixed sample rate
+  - reconnect time after the pty is closed and reopened
+
+Usage:
+    python benchmark_serial.py --protocol ascii --seconds 3 --rate 1000
+    python benchmark_serial.py --protocol binary --output benchmark_results/serial.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import time
+from euler_serial import EulerSerial
+from serial_loopback import FirmwareEmulator
+from benchmark_pipeline import latency_stats
+
+
+class BatchCounter:
+    """ Batch handler that counts samples and measures their lag behind the emulator clock """
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.samples = 0
+        self.batches = 0
+        self.lags_ns = []
+        self.first_sample_at = None
+        self.calibrations = 0
+
+    async def on_batch(self, batch):
+        now_us = self.emulator.timestamp_us()
+        if self.first_sample_at is None:
+            self.first_sample_at = time.perf_counter()
+        self.samples += len(batch['timestamp'])
+        self.batches += 1
+        # Lag of the newest sample in the batch, in nanoseconds
+        self.lags_ns.append((now_us - int(batch['timestamp'][-1])) * 1000)
+
+    async def on_calibration(self, message):
+        self.calibrations += 1
+
+
+async def open_reader(emulator, counter, protocol):
+    reader = EulerSerial(emulator.port, baud_rate=921600, protocol=protocol, debugLevel=0, reconnect_interval=0.05)
+    reader.set_on_batch_handler(counter.on_batch)
+    reader.set_on_calibration_start_handler(counter.on_calibration)
+    await reader.start_reading()
+    return reader
+
+
+async def run_max_rate(protocol, seconds):
+    """ Samples/s parsed while the emulator writes as fast as the pty accepts """
+    emulator = FirmwareEmulator(rate_hz=None, protocol=protocol, garbage_every=5000, block_size=256)
+    emulator.start()
+    counter = BatchCounter(emulator)
+    reader = await open_reader(emulator, counter, protocol)
+    await asyncio.sleep(0.2)  # Warm up
+    samples_before, start = counter.samples, time.perf_counter()
+    await asyncio.sleep(seconds)
+    samples, elapsed = counter.samples - samples_before, time.perf_counter() - start
+    await reader.close()
+    emulator.close()
+    return {
+        'samples_per_s': samples / elapsed,
+        'bytes_per_sample': emulator.bytes_sent / max(emulator.sent, 1),
+        'mean_batch_size': counter.samples / max(counter.batches, 1),
+        'garbage_reported': reader.parser.garbage,
+        'crc_errors': getattr(reader.parser, 'crc_errors', 0),
+    }
+
+
+async def run_lag(protocol, seconds, rate_hz):
+    """ Lag between the emulator writing a sample and the batch handler receiving it """
+    emulator = FirmwareEmulator(rate_hz=rate_hz, protocol=protocol, calibration_every_s=1.0, garbage_every=rate_hz)
+    emulator.start()
+    counter = BatchCounter(emulator)
+    reader = await open_reader(emulator, counter, protocol)
+    await asyncio.sleep(seconds)
+    await reader.close()
+    emulator.close()
+    results = latency_stats(counter.lags_ns)
+    results.update({
+        'rate_hz': rate_hz,
+        'sent': emulator.sent,
+        'received': counter.samples,
+        'mean_batch_size': counter.samples / max(counter.batches, 1),
+        'calibrations_seen': counter.calibrations,
+    })
+    return results
+
+
+async def run_reconnect(protocol, rate_hz, downtime_s=0.5):
+    """ Close the pty mid-stream, reopen it and time how long samples take to resume """
+    emulator = FirmwareEmulator(rate_hz=rate_hz, protocol=protocol)
+    emulator.start()
+    counter = BatchCounter(emulator)
+    reader = await open_reader(emulator, counter, protocol)
+    await asyncio.sleep(0.5)
+
+    emulator.close()
+    await asyncio.sleep(downtime_s)
+    counter.first_sample_at = None
+    reopened = time.perf_counter()
+    emulator.start()
+    deadline = reopened + 10
+    while counter.first_sample_at is None and time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.2)
+    await reader.close()
+    emulator.close()
+
+    resumed = counter.first_sample_at
+    return {
+        'downtime_s': downtime_s,
+        'resume_after_reopen_s': None if resumed is None else resumed - reopened,
+        'reconnects': reader.reconnects,
+        'sent': emulator.sent,
+        'received': counter.samples,
+    }
+
+
+async def run_benchmark(protocol='ascii', seconds=3.0, rate_hz=1000):
+    # EulerSerial prints connection and calibration messages; keep the report readable
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = {
+            'protocol': protocol,
+            'max_rate': await run_max_rate(protocol, seconds),
+            'lag': await run_lag(protocol, seconds, rate_hz),
+            'reconnect': await run_reconnect(protocol, rate_hz),
+        }
+    results['python'] = platform.python_version()
+    results['machine'] = platform.machine()
+    results['created'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    return results
+
+
+def print_results(results):
+    max_rate, lag, reconnect = results['max_rate'], results['lag'], results['reconnect']
+    print(f"protocol {results['protocol']}")
+    print(f"  max parse rate  {max_rate['samples_per_s']:10.0f} samples/s, "
+          f"{max_rate['bytes_per_sample']:.1f} bytes/sample, {max_rate['mean_batch_size']:.0f} samples/batch")
+    if lag['count']:
+        print(f"  lag at {lag['rate_hz']} Hz  p50 {lag['p50_us']:8.1f} us   p99 {lag['p99_us']:8.1f} us   "
+              f"({lag['received']}/{lag['sent']} samples, {lag['calibrations_seen']} calibration banners)")
+    resume = reconnect['resume_after_reopen_s']
+    print(f"  reconnect       {'never resumed' if resume is None else f'{resume * 1000:.0f} ms after reopen'}, "
+          f"{reconnect['reconnects']} reconnects")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark EulerSerial on a pty firmware emulator")
+    parser.add_argument('--protocol', default='ascii', choices=['ascii', 'binary'])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--rate', type=int, default=1000, help="Sample rate of the lag and reconnect tests")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.protocol, args.seconds, args.rate))
+    print_results(results)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
@@ -0,0 +1,65 @@
+import asyncio
+from collections import deque
+import websockets
+
+# What a client queue does when it is full:
+#   'drop_oldest' - keep the newest max_queue frames, dropping the oldest
+#   'latest'      - keep only the newest frame (conflation), for renderers
+QUEUE_POLICIES = ('drop_oldest', 'latest')
+
+
+class ClientChannel:
+    """
+    Bounded send queue plus writer task for one websocket client.
+    put() never waits, so a slow client only loses its own frames and never
+    stalls fusion or the other clients.
+    """
+    def __init__(self, websocket, max_queue=64, policy='drop_oldest'):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {QUEUE_POLICIES}")
+        self.websocket = websocket
+        self.max_queue = 1 if policy == 'latest' else max_queue
+        self.policy = policy
+        # Set by SensorDataServer.subscribe
+        self.subscription = None
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self.task = asyncio.create_task(self.write_loop())
+
+    def put(self, message):
+        """ Queue a frame for this client, dropping according to the policy when full """
+        if self.closed:
+            return
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message)
+        self.ready.set()
+
+    async def write_loop(self):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.queue:
+                    await self.websocket.send(self.queue.popleft())
+                    self.sent += 1
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+
+    async def close(self):
+        self.closed = True
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self):
+        return {'sent': self.sent, 'dropped': self.dropped, 'queued': len(self.queue), 'policy': self.policy,
+                'subscription': repr(self.subscription)}
@@ -0,0 +1,137 @@
+import asyncio
+import numpy as np
+from ahrsPhoneSensor import SensorDataHandler
+from ahrs_Mad import AhrsProcessor
+from euler_serial import EulerSerial
+from sensor_recorder import SensorRecorder
+from sensor_replay import SensorReplay
+
+DEVICE_SOURCES = ('phone', 'serial', 'replay')
+PHONE_SENSORS = [
+    "android.sensor.accelerometer",
+    "android.sensor.gyroscope",
+    "android.sensor.magnetic_field",
+    "android.sensor.orientation",
+]
+
+
+def make_ahrs_processor():
+    return AhrsProcessor(
+        sample_rate=1000, gain=0.041, gyroscope_range=2000,
+        acceleration_rejection=10, magnetic_rejection=10, recovery_trigger_period=5*1000
+    )
+
+
+class DeviceSource:
+    """
+    One named input of SensorDataServer: the handler that reads the device, its
+    own AhrsProcessor state and, optionally, its own recorder.
+
+    Every yield_every fused frames the device yields to the event loop, so a
+    device that always has data buffered cannot starve the other devices or the
+    client writer tasks.
+
+    :param device_id: Name put into every outgoing frame of this device.
+    :param index: Number of the device in binary frames.
+    :param source: One of DEVICE_SOURCES.
+    :param address: Phone "host:port", serial port path, or recording path for replay.
+    :param broadcast: Coroutine function(output, device) that sends a fused frame.
+    """
+    def __init__(self, device_id, index, source, address, broadcast, record_path=None, replay_speed=1.0,
+                 timestamp_scale=None, serial_protocol="ascii", baud_rate=921600, yield_every=64):
+        if source not in DEVICE_SOURCES:
+            raise ValueError(f"Unknown data source {source!r}, expected one of {DEVICE_SOURCES}")
+        self.id = device_id
+        self.index = index
+        self.source = source
+        self.broadcast = broadcast
+        self.yield_every = yield_every
+        self.frames = 0
+        self.sequence = 0
+        self.recorder = SensorRecorder(record_path) if record_path else None
+        self.ahrs_processor = make_ahrs_processor()
+        # Set by SensorDataServer to fuse in worker processes instead of in process
+        self.fusion_pool = None
+
+        if source == "phone":
+            self.timestamp_scale = timestamp_scale or 1e9
+            self.handler = SensorDataHandler(address, PHONE_SENSORS, debugLevel=0, trigger='gyro')
+            self.handler.add_callback(self.process_and_broadcast)
+        elif source == "serial":
+            self.timestamp_scale = timestamp_scale or 1e6
+            self.handler = EulerSerial(address, baud_rate=baud_rate, protocol=serial_protocol)
+            self.handler.set_on_batch_handler(self.process_batch_and_broadcast)
+        elif source == "replay":
+            self.timestamp_scale = timestamp_scale or 1e9
+            self.handler = SensorReplay(address, speed=replay_speed, timestamp_scale=self.timestamp_scale, debugLevel=1)
+            self.handler.add_callback(self.process_and_broadcast)
+
+    @classmethod
+    def from_config(cls, index, config, broadcast, yield_every=64):
+        """
+        Build a device from a dict such as
+            {"id": "imu0", "source": "serial", "address": "/dev/ttyACM0", "serial_protocol": "binary"}
+        Keys other than id, source and address are passed on as keyword arguments.
+        """
+        config = dict(config)
+        device_id = config.pop('id')
+        source = config.pop('source')
+        address = config.pop('address')
+        config.setdefault('yield_every', yield_every)
+        return cls(device_id, index, source, address, broadcast, **config)
+
+    async def start(self):
+        if self.source in ("phone", "replay"):
+            asyncio.create_task(self.handler.connect())
+        elif self.source == "serial":
+            await self.handler.start_reading()
+
+    async def fused(self, output):
+        await self.broadcast(output, self)
+        self.sequence += 1
+        self.frames += 1
+        if self.frames % self.yield_every == 0:
+            await asyncio.sleep(0)  # Give the other devices a turn
+
+    async def process_and_broadcast(self, data):
+        if self.recorder:
+            self.recorder.record(data)
+
+        gyro = np.array(data['gyro'], dtype=float)
+        accel = np.array(data['accel'], dtype=float)
+        mag = np.array(data['mag'], dtype=float)
+        orientation = np.array(data.get('orientation', [0, 0, 0]), dtype=float)  # Default to [0, 0, 0] if not present
+        timestamp = data['timestamp'] / self.timestamp_scale
+
+        if self.fusion_pool:
+            # The fused frame comes back through FusionPool.dispatch
+            self.fusion_pool.submit(self.index, timestamp, gyro, accel, mag, orientation)
+            return
+        output = self.ahrs_processor.update(gyro, accel, mag, orientation, timestamp)
+        await self.fused(output)
+
+    async def process_batch_and_broadcast(self, batch):
+        """ Fuse and broadcast an EulerSerial batch sample by sample, without per-sample dicts """
+        if self.recorder:
+            self.recorder.record_batch(batch)
+
+        timestamps = batch['timestamp'] / self.timestamp_scale
+        if self.fusion_pool:
+            self.fusion_pool.submit_batch(self.index, timestamps, batch['gyro'], batch['accel'], batch['mag'])
+            return
+        gyro = batch['gyro']
+        accel = batch['accel']
+        mag = batch['mag']
+        orientation = np.zeros(3)
+        for i in range(len(timestamps)):
+            output = self.ahrs_processor.update(gyro[i], accel[i], mag[i], orientation, timestamps[i])
+            await self.fused(output)
+
+    async def close(self):
+        if self.source == "serial" or self.source == "replay":
+            await self.handler.close()
+        if self.recorder:
+            self.recorder.close()
+
+    def stats(self):
+        return {'id': self.id, 'source': self.source, 'frames': self.frames}
@@ -1,16 +1,48 @@
 import asyncio
+import inspect
+import serial
 import serial_asyncio
+from serial_parser import PARSERS
 
 class EulerSerial:
-    def __init__(self, port, baud_rate=115200):
+    """
+    Reads the IMU firmware's serial output.
+    The port is read in large chunks and parsed in bulk; samples are delivered as
+    batches (see serial_parser.make_batch). Batches are queued and handed to the
+    handlers by a single task, one at a time and in order, so a handler that
+    awaits partway through a batch never sees the next batch interleaved. Handlers set
+    with set_on_batch_handler get the batch as is; handlers set with
+    set_on_data_handler are called once per sample with the old dict layout.
+
+    protocol selects the firmware output format of this port: 'ascii' for
+    whitespace separated lines, 'binary' for CRC checked frames (see serial_parser).
+    """
+    def __init__(self, port, baud_rate=115200, chunk_size=65536, debugLevel=1, protocol='ascii',
+                 reconnect_interval=5):
+        if protocol not in PARSERS:
+            raise ValueError(f"Unknown serial protocol {protocol!r}, expected one of {tuple(PARSERS)}")
         self.port = port
         self.baud_rate = baud_rate
+        self.chunk_size = chunk_size
+        self.reconnect_interval = reconnect_interval
+        self.reconnects = 0
+        self.debugLevel = debugLevel
         self.reader = None
         self.writer = None
+        self.protocol = protocol
+        self.parser = PARSERS[protocol]()
         self.on_data = None
+        self.on_batch = None
         self.on_calibration_start = None
         self.on_calibration_end = None
         self.running = False
+        # Parsed batches waiting for dispatch_loop
+        self.batches = asyncio.Queue()
+        self.dispatcher = None
+
+    def log(self, message, level=1):
+        if level <= self.debugLevel:
+            print(message)
 
     async def initialize_serial(self):
         while self.reader is None or self.writer is None:
@@ -18,14 +50,18 @@ class EulerSerial:
                 self.reader, self.writer = await serial_asyncio.open_serial_connection(
                     url=self.port, baudrate=self.baud_rate
                 )
+                self.parser.reset()
                 print("Connected successfully to", self.port)
             except serial.serialutil.SerialException as e:
-                print(f"Failed to connect to {self.port}: {e}. Retrying in 5 seconds...")
-                await asyncio.sleep(5)
+                print(f"Failed to connect to {self.port}: {e}. Retrying in {self.reconnect_interval} seconds...")
+                await asyncio.sleep(self.reconnect_interval)
 
     def set_on_data_handler(self, handler):
         self.on_data = handler
 
+    def set_on_batch_handler(self, handler):
+        self.on_batch = handler
+
     def set_on_calibration_start_handler(self, handler):
         self.on_calibration_start = handler
 
@@ -35,59 +71,93 @@ class EulerSerial:
     async def start_reading(self):
         await self.initialize_serial()
         self.running = True
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.create_task(self.dispatch_loop())
         asyncio.create_task(self._read_loop())
 
     async def _read_loop(self):
         while self.running:
             try:
                 if self.reader:
-                    data = await self.reader.readline()
-                    data = data.decode('utf-8').strip()
-                    
-                    if "Start compass calibration" in data:
-                        if self.on_calibration_start:
-                            asyncio.create_task(self.on_calibration_start(data))
-                        print("Compass calibration has started.")
-                    
-                    elif "End of compass calibration" in data:
-                        if self.on_calibration_end:
-                            asyncio.create_task(self.on_calibration_end("Compass calibration completed successfully."))
-                        print("Compass calibration has ended successfully.")
-                    
-                    elif "Calibrating Accelerometer and Gyroscope" in data:
-                        print("Calibration of Accelerometer and Gyroscope has started.")
-                    
-                    elif "Accelerometer & Gyro calibration complete" in data:
-                        print("Accelerometer and Gyroscope calibration completed successfully.")
-                    
-                    elif "Acc Bias" in data:
-                        print("Calibration biases:", data)
-                    
-                    elif data == "":
-                        print("Received empty line.")
-
-                    elif self.on_data:
-                        print("Data:", data)
-                        data_split = data.split()
-                        dict_data = {
-                            "timestamp": int(data_split[0]),
-                            "accel": [float(data_split[1]), float(data_split[2]), float(data_split[3])],
-                            "gyro": [float(data_split[4]), float(data_split[5]), float(data_split[6])],
-                            "mag": [float(data_split[7]), float(data_split[8]), float(data_split[9])]
-                        }
-                        asyncio.create_task(self.on_data(dict_data))
-                    
+                    chunk = await self.reader.read(self.chunk_size)
+                    if not chunk:
+                        raise OSError("end of stream")
+                    for kind, payload in self.parser.feed(chunk):
+                        self.handle_event(kind, payload)
+
             except (serial.serialutil.SerialException, OSError) as e:
+                if not self.running:
+                    # close() shut the port down under us
+                    break
                 print("Connection lost... attempting to reconnect. Error:", e)
+                if self.writer:
+                    self.writer.close()
                 self.reader = None
                 self.writer = None
+                self.reconnects += 1
                 await self.initialize_serial()
 
+    def handle_event(self, kind, payload):
+        if kind == 'data':
+            if self.on_batch or self.on_data:
+                self.batches.put_nowait(payload)
+            if self.debugLevel >= 2:
+                self.log(f"Data: {len(payload['timestamp'])} samples", 2)
+
+        elif kind == 'calibration_start':
+            if self.on_calibration_start:
+                asyncio.create_task(self.on_calibration_start(payload))
+            print("Compass calibration has started.")
+
+        elif kind == 'calibration_end':
+            if self.on_calibration_end:
+                asyncio.create_task(self.on_calibration_end("Compass calibration completed successfully."))
+            print("Compass calibration has ended successfully.")
+
+        elif kind == 'imu_calibration_start':
+            print("Calibration of Accelerometer and Gyroscope has started.")
+
+        elif kind == 'imu_calibration_end':
+            print("Accelerometer and Gyroscope calibration completed successfully.")
+
+        elif kind == 'bias':
+            print("Calibration biases:", payload)
+
+        else:
+            self.log(f"Ignored line: {payload!r}", 2)
+
+    async def dispatch_loop(self):
+        while True:
+            batch = await self.batches.get()
+            try:
+                await self.dispatch_batch(batch)
+            except Exception as e:
+                print("Batch handler failed:", e)
+
+    async def dispatch_batch(self, batch):
+        if self.on_batch:
+            result = self.on_batch(batch)
+            if inspect.isawaitable(result):
+                await result
+            return
+
+        timestamps = batch['timestamp'].tolist()
+        accel = batch['accel'].tolist()
+        gyro = batch['gyro'].tolist()
+        mag = batch['mag'].tolist()
+        for i, timestamp in enumerate(timestamps):
+            result = self.on_data({"timestamp": timestamp, "accel": accel[i], "gyro": gyro[i], "mag": mag[i]})
+            if inspect.isawaitable(result):
+                await result
+
     async def stop_reading(self):
         self.running = False
 
     async def close(self):
         await self.stop_reading()
+        if self.dispatcher:
+            self.dispatcher.cancel()
+            self.dispatcher = None
         if self.writer:
             self.writer.close()
             await self.writer.wait_closed()
@@ -0,0 +1,117 @@
+import json
+import struct
+import numpy as np
+
+# Wire formats a client can ask for with ws://host:port/?format=...
+#   'json'          - the full process_sensor_data dict (default, used by old clients)
+#   'binary'        - fixed 48 byte frame: header, float32 quaternion and Euler angles
+#   'binary_status' - as 'binary' plus the AHRS flags packed into a status word (52 bytes)
+WIRE_FORMATS = ('json', 'binary', 'binary_status')
+# Top level keys of a JSON frame, in the order they are sent
+FRAME_FIELDS = ('device', 'timestamp', 'quaternion', 'euler_angles', 'internal_states', 'flags', 'orientation')
+
+# Binary frame layout, all little-endian:
+#   magic      2s   b'AF'
+#   version    u8   FRAME_VERSION
+#   flags      u8   FLAG_STATUS if the status word is present
+#   sequence   u32  frame counter of the device, wraps at 2**32
+#   timestamp  f64  seconds
+#   device     u16 + 2 pad bytes, index of the device in the server's device list
+#   quaternion 4 x f32  w, x, y, z
+#   euler      3 x f32  roll, pitch, yaw in degrees
+#   status     u16 + 2 pad bytes, only with FLAG_STATUS (see STATUS_BITS)
+FRAME_MAGIC = b'AF'
+FRAME_VERSION = 2
+FLAG_STATUS = 0x01
+HEADER = struct.Struct('<2sBBIdH2x')
+FRAME = struct.Struct('<2sBBIdH2x4f3f')
+FRAME_WITH_STATUS = struct.Struct('<2sBBIdH2x4f3fH2x')
+
+# Bit i of the status word is set when the AhrsOutput attribute STATUS_BITS[i] is true
+STATUS_BITS = (
+    'initialising',
+    'angular_rate_recovery',
+    'acceleration_recovery',
+    'magnetic_recovery',
+    'accelerometer_ignored',
+    'magnetometer_ignored',
+)
+
+
+class NumpyEncoder(json.JSONEncoder):
+    """ Custom encoder for numpy data types """
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return json.JSONEncoder.default(self, obj)
+
+
+def status_word(output):
+    """ Pack the boolean AHRS states of an AhrsOutput into an integer """
+    word = 0
+    for bit, key in enumerate(STATUS_BITS):
+        if getattr(output, key):
+            word |= 1 << bit
+    return word
+
+
+def encode_json(output, fields=None, device_id=None):
+    """ Encode an AhrsOutput as JSON, keeping only the given top level fields (all by default) """
+    frame = output.to_dict()
+    if device_id is not None:
+        frame = {'device': device_id, **frame}
+    if fields is not None:
+        frame = {key: frame[key] for key in fields if key in frame}
+    return json.dumps(frame, cls=NumpyEncoder)
+
+
+def encode_binary(output, sequence, status=False, device_index=0):
+    """
+    Pack an AhrsOutput into a binary frame.
+    :param output: AhrsOutput from AhrsProcessor.update.
+    :param sequence: Frame counter, truncated to 32 bits.
+    :param status: Append the status word.
+    :param device_index: Number of the device that produced the frame.
+    """
+    q = output.quaternion
+    e = output.euler_angles
+    timestamp = output.timestamp or 0.0
+    sequence &= 0xFFFFFFFF
+    if status:
+        return FRAME_WITH_STATUS.pack(FRAME_MAGIC, FRAME_VERSION, FLAG_STATUS, sequence, timestamp, device_index,
+                                      q[0], q[1], q[2], q[3], e[0], e[1], e[2], status_word(output))
+    return FRAME.pack(FRAME_MAGIC, FRAME_VERSION, 0, sequence, timestamp, device_index,
+                      q[0], q[1], q[2], q[3], e[0], e[1], e[2])
+
+
+def encode_frame(output, wire_format, sequence=0, fields=None, device_id=None, device_index=0):
+    """
+    Encode an AhrsOutput in one of WIRE_FORMATS; fields only applies to JSON.
+    JSON frames are tagged with device_id (when given), binary frames with device_index.
+    """
+    if wire_format == 'json':
+        return encode_json(output, fields, device_id)
+    if wire_format == 'binary':
+        return encode_binary(output, sequence, device_index=device_index)
+    if wire_format == 'binary_status':
+        return encode_binary(output, sequence, status=True, device_index=device_index)
+    raise ValueError(f"Unknown wire format {wire_format!r}, expected one of {WIRE_FORMATS}")
+
+
+def decode_binary(frame):
+    """ Decode a binary frame into a dict, for Python clients and debugging """
+    magic, version, flags, sequence, timestamp, device = HEADER.unpack_from(frame)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"Not a version {FRAME_VERSION} orientation frame")
+    layout = FRAME_WITH_STATUS if flags & FLAG_STATUS else FRAME
+    fields = layout.unpack(frame)
+    decoded = {
+        'device': device,
+        'sequence': sequence,
+        'timestamp': timestamp,
+        'quaternion': np.array(fields[6:10]),
+        'euler_angles': np.array(fields[10:13]),
+    }
+    if flags & FLAG_STATUS:
+        decoded['status'] = {key: bool(fields[13] >> bit & 1) for bit, key in enumerate(STATUS_BITS)}
+    return decoded
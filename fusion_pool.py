@@ -0,0 +1,195 @@
+import asyncio
+import multiprocessing
+import time
+import numpy as np
+from ahrs_Mad import AhrsOutput, BOOLEAN_INTERNAL_STATES, FLAG_FIELDS, INTERNAL_STATE_FIELDS
+from device_sources import make_ahrs_processor
+from shm_ring import SharedRing
+
+# One raw sample on its way to a worker; timestamps are in seconds
+SAMPLE_DTYPE = np.dtype([
+    ('device', '<u2'),
+    ('timestamp', '<f8'),
+    ('gyro', '<f8', (3,)),
+    ('accel', '<f8', (3,)),
+    ('mag', '<f8', (3,)),
+    ('orientation', '<f8', (3,)),
+])
+# One fused sample on its way back, with the fields of AhrsOutput
+RESULT_DTYPE = np.dtype([
+    ('device', '<u2'),
+    ('timestamp', '<f8'),
+    ('quaternion', '<f8', (4,)),
+    ('euler_angles', '<f8', (3,)),
+    ('orientation', '<f8', (3,)),
+] + [(key, '?' if key in BOOLEAN_INTERNAL_STATES else '<f8') for key in INTERNAL_STATE_FIELDS]
+  + [(key, '?') for key in FLAG_FIELDS])
+
+
+def fusion_worker(input_name, output_name, capacity, idle_sleep):
+    """
+    Worker process: fuse the samples of its devices, one AhrsProcessor per device.
+    Runs until the input ring is marked closed and drained.
+    """
+    inputs = SharedRing(SAMPLE_DTYPE, capacity, name=input_name)
+    outputs = SharedRing(RESULT_DTYPE, capacity, name=output_name)
+    processors = {}
+    try:
+        while True:
+            # Never take more than the output ring can hold
+            samples = inputs.pop(capacity - len(outputs))
+            if len(samples) == 0:
+                if inputs.closed:
+                    break
+                time.sleep(idle_sleep)
+                continue
+
+            results = np.empty(len(samples), dtype=RESULT_DTYPE)
+            results['device'] = samples['device']
+            results['orientation'] = samples['orientation']
+            for device in np.unique(samples['device']).tolist():
+                rows = np.flatnonzero(samples['device'] == device)
+                processor = processors.get(device)
+                if processor is None:
+                    processor = processors[device] = make_ahrs_processor()
+                fused = processor.process_batch(samples['gyro'][rows], samples['accel'][rows], samples['mag'][rows],
+                                                samples['timestamp'][rows])
+                results['timestamp'][rows] = fused['timestamp']
+                results['quaternion'][rows] = fused['quaternion']
+                results['euler_angles'][rows] = fused['euler_angles']
+                for key in INTERNAL_STATE_FIELDS:
+                    results[key][rows] = fused['internal_states'][key]
+                for key in FLAG_FIELDS:
+                    results[key][rows] = fused['flags'][key]
+            outputs.push(results)
+    finally:
+        inputs.close()
+        outputs.close()
+
+
+def fill_output(output, result):
+    """ Copy one RESULT_DTYPE record into a reusable AhrsOutput """
+    output.timestamp = float(result['timestamp'])
+    output.quaternion[:] = result['quaternion']
+    output.euler_angles[:] = result['euler_angles']
+    output.orientation = result['orientation']
+    for key in INTERNAL_STATE_FIELDS:
+        setattr(output, key, result[key].item())
+    for key in FLAG_FIELDS:
+        setattr(output, key, result[key].item())
+    return output
+
+
+class FusionPool:
+    """
+    Runs the AHRS fusion of SensorDataServer devices in worker processes.
+    Ingest stays on the event loop: submit() copies samples into a shared memory
+    ring per worker and collect() copies fused results out of a second ring, so
+    nothing is pickled per sample. Device i is fused by worker i % worker_count,
+    which keeps each device's AhrsProcessor state in one process.
+
+    :param worker_count: Number of worker processes.
+    :param capacity: Records per ring; samples that do not fit are dropped and counted.
+    :param idle_sleep: Seconds a worker sleeps when it has nothing to do.
+    """
+    def __init__(self, worker_count, capacity=8192, idle_sleep=0.0005):
+        self.worker_count = worker_count
+        self.capacity = capacity
+        self.idle_sleep = idle_sleep
+        self.inputs = []
+        self.outputs = []
+        self.workers = []
+        self.submitted = 0
+        self.dropped = 0
+        self.scratch = np.zeros(1, dtype=SAMPLE_DTYPE)
+
+    def start(self):
+        # spawn rather than fork, the parent is running an event loop
+        context = multiprocessing.get_context('spawn')
+        for _ in range(self.worker_count):
+            inputs = SharedRing(SAMPLE_DTYPE, self.capacity)
+            outputs = SharedRing(RESULT_DTYPE, self.capacity)
+            worker = context.Process(target=fusion_worker, daemon=True,
+                                     args=(inputs.name, outputs.name, self.capacity, self.idle_sleep))
+            worker.start()
+            self.inputs.append(inputs)
+            self.outputs.append(outputs)
+            self.workers.append(worker)
+
+    def push(self, device_index, samples):
+        if not self.inputs:
+            # Not started or already closed, e.g. a source still delivering during shutdown
+            self.dropped += len(samples)
+            return
+        pushed = self.inputs[device_index % self.worker_count].push(samples)
+        self.submitted += pushed
+        self.dropped += len(samples) - pushed
+
+    def submit(self, device_index, timestamp, gyro, accel, mag, orientation):
+        """ Queue one sample of a device for fusion """
+        sample = self.scratch
+        sample['device'] = device_index
+        sample['timestamp'] = timestamp
+        sample['gyro'] = gyro
+        sample['accel'] = accel
+        sample['mag'] = mag
+        sample['orientation'] = orientation
+        self.push(device_index, sample)
+
+    def submit_batch(self, device_index, timestamps, gyro, accel, mag, orientation=None):
+        """ Queue [N] samples of a device for fusion """
+        samples = np.zeros(len(timestamps), dtype=SAMPLE_DTYPE)
+        samples['device'] = device_index
+        samples['timestamp'] = timestamps
+        samples['gyro'] = gyro
+        samples['accel'] = accel
+        samples['mag'] = mag
+        if orientation is not None:
+            samples['orientation'] = orientation
+        self.push(device_index, samples)
+
+    def collect(self):
+        """ Return the fused results available from every worker, as RESULT_DTYPE arrays """
+        results = []
+        for outputs in self.outputs:
+            if len(outputs):
+                results.append(outputs.pop())
+        return results
+
+    def check_workers(self):
+        """ Raise RuntimeError if a worker process has exited, since its devices would never be fused again """
+        for index, worker in enumerate(self.workers):
+            if not worker.is_alive():
+                raise RuntimeError(f"Fusion worker {index} exited with code {worker.exitcode}")
+
+    async def dispatch(self, devices, poll_interval=0.001):
+        """
+        Hand fused results to their DeviceSource until the pool is closed.
+        Raises RuntimeError if a worker dies.
+        :param devices: DeviceSource objects indexed by device index.
+        """
+        output = AhrsOutput()
+        while self.workers:
+            self.check_workers()
+            results = self.collect()
+            if not results:
+                await asyncio.sleep(poll_interval)
+                continue
+            for block in results:
+                for result in block:
+                    await devices[int(result['device'])].fused(fill_output(output, result))
+
+    def close(self):
+        """ Let the workers drain their input, then stop them and free the rings """
+        for inputs in self.inputs:
+            inputs.mark_closed()
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for ring in self.inputs + self.outputs:
+            ring.close()
+        self.inputs, self.outputs, self.workers = [], [], []
+
+    def stats(self):
+        return {'workers': self.worker_count, 'submitted': self.submitted, 'dropped': self.dropped}
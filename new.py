@@ -4,8 +4,10 @@ from PyQt5 import QtWidgets, QtCore
 import pyqtgraph as pg
 import pyqtgraph.opengl as gl
 from phone_data import SensorDataHandler  # Ensure this module correctly imports FIRFilter and RCFilter
+from plot_decimation import MinMaxDecimator
 
-data_store = []
+# Pitch and roll over time: 10 minutes at 500 Hz, decimated to the plot width when drawn
+data_store = MinMaxDecimator(500 * 60 * 10, 2)
 
 def calculate_pitch_roll(accel):
     ax, ay, az = accel
@@ -17,7 +19,7 @@ def sensor_callback(sensor_type, timestamp, data):
     if sensor_type == 'android.sensor.accelerometer':
         pitch, roll = calculate_pitch_roll(data)
         timestamp_sec = timestamp / 1000000  # Convert timestamp to seconds
-        data_store.append((timestamp_sec, pitch, roll))
+        data_store.append(timestamp_sec, (pitch, roll))
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self, *args, **kwargs):
@@ -92,27 +94,29 @@ class MainWindow(QtWidgets.QMainWindow):
         self.timer.start()
 
     def update_plot_data(self):
-        # Get the latest data points; limit to the last 1000 points for performance
-        time_data = [d[0] for d in data_store[-1000:]]
-        pitch_data = [d[1] for d in data_store[-1000:]]
-        roll_data = [d[2] for d in data_store[-1000:]]
+        # Visible time range, or the whole history while auto-ranging
+        view_box = self.graphWidget.getViewBox()
+        if view_box.autoRangeEnabled()[0]:
+            t_start = t_end = None
+        else:
+            t_start, t_end = view_box.viewRange()[0]
+
+        # At most one min/max pair per horizontal pixel
+        time_data, angles = data_store.get(2 * self.graphWidget.width(), t_start, t_end)
 
         # Update the plots
-        self.plot_lines['Pitch'].setData(time_data, pitch_data)
-        self.plot_lines['Roll'].setData(time_data, roll_data)
+        self.plot_lines['Pitch'].setData(time_data, angles[:, 0])
+        self.plot_lines['Roll'].setData(time_data, angles[:, 1])
 
 
 
-# Filter configurations
+# Filter configurations: one 4th-order Butterworth low-pass stage per sensor
 filter_configs = {
     'android.sensor.accelerometer': [
-        {'type': 'FIR', 'params': {'length': 10, 'coefficient': 0.1}},
-        {'type': 'RC', 'params': {'cutoff_freq_hz': 5, 'sample_time_s': 0.01}}
+        {'type': 'SOS', 'params': {'cutoff_freq_hz': 5, 'sample_time_s': 0.01, 'order': 4}}
     ],
     'android.sensor.gyroscope': [
-        
-        {'type': 'FIR', 'params': {'length': 10, 'coefficient': 0.1}},
-        {'type': 'RC', 'params': {'cutoff_freq_hz': 5, 'sample_time_s': 0.01}}
+        {'type': 'SOS', 'params': {'cutoff_freq_hz': 5, 'sample_time_s': 0.01, 'order': 4}}
     ]
 }
 
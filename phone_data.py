@@ -2,7 +2,7 @@ import json
 import numpy as np
 import threading
 import websocket
-from filters import FIRFilter, RCFilter
+from filters import FIRFilterBank, RCFilterBank, SOSFilterBank, filter_block
 
 class SensorDataHandler:
     def __init__(self, address, sensors, normalize=False, debugLevel=0, filter_configs={}):
@@ -20,21 +20,27 @@ class SensorDataHandler:
             print(message)
 
     def create_filters(self, filter_config):
-        """ Initialize filters based on the configuration provided """
+        """ Initialize filters based on the configuration provided, each filtering all axes of a sensor """
         filters = []
         for config in filter_config:
             if config['type'] == 'FIR':
-                filters.append(FIRFilter(**config['params']))
+                filters.append(FIRFilterBank(**config['params']))
             elif config['type'] == 'RC':
-                filters.append(RCFilter(**config['params']))
+                filters.append(RCFilterBank(**config['params']))
+            elif config['type'] == 'SOS':
+                filters.append(SOSFilterBank(**config['params']))
         return filters
 
     def apply_filters(self, sensor_type, values):
-        """ Apply configured filters sequentially to the values """
+        """ Apply configured filters sequentially to the values, keeping separate state per axis """
         for filter_obj in self.filters[sensor_type]:
-            values = np.array([filter_obj.update(v) for v in values])
+            values = filter_obj.update(values)
         return values
 
+    def apply_filters_block(self, sensor_type, values):
+        """ Apply the configured filters of a sensor to a recorded [N, axes] block in one call """
+        return filter_block(self.filters[sensor_type], values)
+
     def on_message(self, ws, message):
         self.log(f"Message received: {message}", 2)
         data = json.loads(message)
@@ -0,0 +1,110 @@
+import threading
+import numpy as np
+
+
+class MinMaxDecimator:
+    """
+    Plot data source for long, high-rate histories.
+    Keeps the raw samples plus a pyramid of per-block minima and maxima (blocks of
+    factor, factor**2, ... samples) and returns, for the visible time range, only as
+    many points as fit on screen. Each block is drawn as its min and max at the same
+    x position, so short spikes stay visible however far the plot is zoomed out.
+
+    Appends may come from a websocket thread while the Qt timer queries, so both
+    are guarded by a lock. The pyramid is brought up to date lazily in get().
+    """
+    def __init__(self, capacity, channels, factor=4):
+        """
+        :param capacity: Raw samples kept; the oldest half is dropped when full.
+        :param channels: Number of values per sample.
+        :param factor: Samples per block at the first level, and the ratio between levels.
+        """
+        self.capacity = capacity
+        self.channels = channels
+        self.factor = factor
+        self.times = np.zeros(capacity)
+        self.values = np.zeros((capacity, channels))
+        self.count = 0
+        self.summarised = 0  # Samples already folded into the pyramid
+
+        # levels[k] summarises blocks of factor ** (k + 1) samples
+        self.levels = []
+        size = factor
+        while True:
+            blocks = -(-capacity // size)
+            self.levels.append((np.zeros((blocks, channels)), np.zeros((blocks, channels))))
+            if blocks == 1:
+                break
+            size *= factor
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, values):
+        with self.lock:
+            if self.count == self.capacity:
+                self.drop_oldest(self.capacity // 2)
+            self.times[self.count] = timestamp
+            self.values[self.count] = values
+            self.count += 1
+
+    def drop_oldest(self, n):
+        """Discard the n oldest samples; the pyramid is rebuilt on the next query."""
+        keep = self.count - n
+        self.times[:keep] = self.times[n:self.count]
+        self.values[:keep] = self.values[n:self.count]
+        self.count = keep
+        self.summarised = 0
+
+    def update_levels(self):
+        """Fold samples appended since the last query into every pyramid level."""
+        if self.summarised == self.count:
+            return
+        source_min = source_max = self.values
+        source_size = 1
+        for level_min, level_max in self.levels:
+            size = source_size * self.factor
+            # Children (blocks of the level below) that need re-reducing
+            first = (self.summarised // size) * self.factor
+            end = -(-self.count // source_size)
+            full = (end - first) // self.factor * self.factor
+            block = first // self.factor
+            if full:
+                blocks = full // self.factor
+                level_min[block:block + blocks] = source_min[first:first + full].reshape(blocks, self.factor, self.channels).min(axis=1)
+                level_max[block:block + blocks] = source_max[first:first + full].reshape(blocks, self.factor, self.channels).max(axis=1)
+                block += blocks
+            if end - first > full:
+                level_min[block] = source_min[first + full:end].min(axis=0)
+                level_max[block] = source_max[first + full:end].max(axis=0)
+            source_min, source_max, source_size = level_min, level_max, size
+        self.summarised = self.count
+
+    def get(self, max_points, t_start=None, t_end=None):
+        """
+        Return (times, values) to draw for the time range [t_start, t_end] (everything by default).
+        At most max_points points are returned; values has shape [points, channels].
+        """
+        with self.lock:
+            self.update_levels()
+            times = self.times[:self.count]
+            lo = 0 if t_start is None else max(np.searchsorted(times, t_start, side='left') - 1, 0)
+            hi = self.count if t_end is None else min(np.searchsorted(times, t_end, side='right') + 1, self.count)
+            if hi - lo <= max_points:
+                return times[lo:hi].copy(), self.values[lo:hi].copy()
+
+            # Finest level whose min/max pairs fit in max_points
+            size = 1
+            for level_min, level_max in self.levels:
+                size *= self.factor
+                block_lo, block_hi = lo // size, -(-hi // size)
+                if 2 * (block_hi - block_lo) <= max_points:
+                    break
+
+            blocks = slice(block_lo, block_hi)
+            out_times = np.repeat(self.times[block_lo * size:hi:size], 2)
+            out_values = np.empty((len(out_times), self.channels))
+            out_values[0::2] = level_min[blocks]
+            out_values[1::2] = level_max[blocks]
+            return out_times, out_values
@@ -0,0 +1,202 @@
+"""
+Where a device-mounted laser hits a plane, for whole arrays of orientations at once.
+
+Orientations are [N] arrays of yaw/pitch/roll or [N,4] quaternions [w, x, y, z];
+scalars are treated as N = 1. Every function returns [N,2] hits, the two
+coordinates of the plane that are not its axis, and an [N] validity mask that
+is False where the laser is parallel to the plane (or points away from it with
+forward_only). Invalid hits are NaN.
+
+The laser is described in the device frame by its boresight direction and a
+lever arm from the rotation centre to the laser origin; position is a fixed
+world offset added after the rotation.
+
+For quaternion sources (the phone rotation vector, AhrsOutput.quaternion) use
+Laser, which rotates the precomputed boresight directly and never goes through
+Euler angles.
+"""
+import math
+import numpy as np
+
+# |direction component| below which the laser counts as parallel to the plane
+PARALLEL_EPS = 1e-12
+
+
+def euler_to_matrices(yaw, pitch, roll, degrees=False):
+    """
+    [N,3,3] rotation matrices Rz(yaw) @ Ry(pitch) @ Rx(roll), built in closed
+    form rather than as three matrices and two products per sample.
+    """
+    yaw, pitch, roll = np.broadcast_arrays(*(np.atleast_1d(np.asarray(a, dtype=float)) for a in (yaw, pitch, roll)))
+    if degrees:
+        yaw, pitch, roll = np.radians(yaw), np.radians(pitch), np.radians(roll)
+    cz, sz = np.cos(yaw), np.sin(yaw)
+    cy, sy = np.cos(pitch), np.sin(pitch)
+    cx, sx = np.cos(roll), np.sin(roll)
+
+    matrices = np.empty(yaw.shape + (3, 3))
+    matrices[..., 0, 0] = cz * cy
+    matrices[..., 0, 1] = cz * sy * sx - sz * cx
+    matrices[..., 0, 2] = cz * sy * cx + sz * sx
+    matrices[..., 1, 0] = sz * cy
+    matrices[..., 1, 1] = sz * sy * sx + cz * cx
+    matrices[..., 1, 2] = sz * sy * cx - cz * sx
+    matrices[..., 2, 0] = -sy
+    matrices[..., 2, 1] = cy * sx
+    matrices[..., 2, 2] = cy * cx
+    return matrices
+
+
+def quaternions_to_matrices(quaternions):
+    """ [N,3,3] rotation matrices of [N,4] quaternions [w, x, y, z], normalised first """
+    q = np.atleast_2d(np.asarray(quaternions, dtype=float))
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+
+    matrices = np.empty(q.shape[:-1] + (3, 3))
+    matrices[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[..., 0, 1] = 2 * (x * y - z * w)
+    matrices[..., 0, 2] = 2 * (x * z + y * w)
+    matrices[..., 1, 0] = 2 * (x * y + z * w)
+    matrices[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[..., 1, 2] = 2 * (y * z - x * w)
+    matrices[..., 2, 0] = 2 * (x * z - y * w)
+    matrices[..., 2, 1] = 2 * (y * z + x * w)
+    matrices[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return matrices
+
+
+def rotate_vectors(quaternions, vector):
+    """ Rotate one vector by [N,4] unit quaternions [w, x, y, z]; v + 2w(u x v) + 2u x (u x v) with u = (x, y, z) """
+    q = np.atleast_2d(quaternions)
+    w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    vx, vy, vz = vector
+    # c = u x v
+    cx = y * vz - z * vy
+    cy = z * vx - x * vz
+    cz = x * vy - y * vx
+    rotated = np.empty((len(q), 3))
+    rotated[:, 0] = vx + 2 * (w * cx + y * cz - z * cy)
+    rotated[:, 1] = vy + 2 * (w * cy + z * cx - x * cz)
+    rotated[:, 2] = vz + 2 * (w * cz + x * cy - y * cx)
+    return rotated
+
+
+def rotate_vector(w, x, y, z, vector):
+    """ rotate_vectors for a single unit quaternion, on plain floats """
+    vx, vy, vz = vector
+    cx = y * vz - z * vy
+    cy = z * vx - x * vz
+    cz = x * vy - y * vx
+    return (vx + 2 * (w * cx + y * cz - z * cy),
+            vy + 2 * (w * cy + z * cx - x * cz),
+            vz + 2 * (w * cz + x * cy - y * cx))
+
+
+def intersect_plane(origins, directions, axis, offset, forward_only=False):
+    """
+    Intersect [N,3] lines origin + t * direction with the plane where coordinate
+    axis (0, 1 or 2 for x, y, z) equals offset.
+    :return: [N,2] hits in the remaining coordinates, in x, y, z order, and the [N] validity mask.
+    """
+    slope = directions[:, axis]
+    valid = np.abs(slope) > PARALLEL_EPS
+    t = (offset - origins[:, axis]) / np.where(valid, slope, 1.0)
+    if forward_only:
+        valid &= t >= 0
+    points = origins + t[:, None] * directions
+    hits = np.delete(points, axis, axis=1)
+    hits[~valid] = np.nan
+    return hits, valid
+
+
+def laser_hits(matrices, boresight, lever_arm=(0, 0, 0), position=(0, 0, 0), axis=2, offset=0.0,
+               forward_only=False):
+    """ Plane hits of a laser on a device with [N,3,3] orientations, see the module docstring """
+    directions = matrices @ np.asarray(boresight, dtype=float)
+    origins = matrices @ np.asarray(lever_arm, dtype=float) + np.asarray(position, dtype=float)
+    return intersect_plane(origins, directions, axis, offset, forward_only)
+
+
+def euler_hits(yaw, pitch, roll, boresight, lever_arm=(0, 0, 0), position=(0, 0, 0), axis=2, offset=0.0,
+               degrees=False, forward_only=False):
+    """ Plane hits for [N] yaw/pitch/roll, rotating by Rz(yaw) @ Ry(pitch) @ Rx(roll) """
+    return laser_hits(euler_to_matrices(yaw, pitch, roll, degrees), boresight, lever_arm, position, axis, offset,
+                      forward_only)
+
+
+def quaternion_hits(quaternions, boresight, lever_arm=(0, 0, 0), position=(0, 0, 0), axis=2, offset=0.0,
+                    forward_only=False):
+    """ Plane hits for [N,4] quaternions [w, x, y, z], see Laser """
+    return Laser(boresight, lever_arm, position, axis, offset, forward_only).hits(quaternions)
+
+
+def relative_vector(xd, yd, zd, yaw, roll, pitch, p):
+    """
+    Hits on the plane y = p of the laser the scoring scripts use: it points along
+    +y from (-xd, -yd - 1, -zd) in the device frame, and the device is rotated by
+    Rz(yaw) @ Ry(roll) @ Rx(pitch), angles in radians.
+    :return: [N,2] (x, z) hits and the [N] validity mask.
+    """
+    return euler_hits(yaw, roll, pitch, boresight=(0, 1, 0), lever_arm=(-xd, -yd - 1, -zd), axis=1, offset=p)
+
+
+class Laser:
+    """
+    A laser fixed to the device, hitting the plane where coordinate axis equals
+    offset. Everything that does not depend on the orientation is prepared once,
+    so each quaternion costs one rotation of the boresight (and one of the lever
+    arm, if there is one) and one plane solve: no Euler angles, no trigonometry
+    and no gimbal lock.
+
+    :param boresight: Laser direction in the device frame.
+    :param lever_arm: Laser origin relative to the rotation centre, in the device frame.
+    :param position: World position of the rotation centre.
+    :param axis: 0, 1 or 2 for a plane of constant x, y or z.
+    :param offset: Value of that coordinate on the plane.
+    :param forward_only: Treat hits behind the laser as invalid.
+    """
+    def __init__(self, boresight, lever_arm=(0, 0, 0), position=(0, 0, 0), axis=2, offset=0.0, forward_only=False):
+        self.boresight = tuple(float(v) for v in boresight)
+        self.lever_arm = tuple(float(v) for v in lever_arm)
+        self.position = tuple(float(v) for v in position)
+        self.axis = axis
+        self.offset = float(offset)
+        self.forward_only = forward_only
+        self.has_lever_arm = any(self.lever_arm)
+        # The two coordinates reported for a hit
+        self.plane_axes = tuple(i for i in range(3) if i != axis)
+
+    @classmethod
+    def relative(cls, xd, yd, zd, p):
+        """ The laser of relative_vector: along +y from (-xd, -yd - 1, -zd), hitting the plane y = p """
+        return cls(boresight=(0, 1, 0), lever_arm=(-xd, -yd - 1, -zd), axis=1, offset=p)
+
+    def hits(self, quaternions):
+        """ [N,2] hits and [N] validity mask for [N,4] quaternions [w, x, y, z] """
+        q = np.atleast_2d(np.asarray(quaternions, dtype=float))
+        q = q / np.linalg.norm(q, axis=1, keepdims=True)
+        directions = rotate_vectors(q, self.boresight)
+        origins = np.broadcast_to(self.position, directions.shape)
+        if self.has_lever_arm:
+            origins = origins + rotate_vectors(q, self.lever_arm)
+        return intersect_plane(origins, directions, self.axis, self.offset, self.forward_only)
+
+    def hit(self, w, x, y, z):
+        """ Hit of one quaternion as a tuple of two floats, or None; much cheaper than hits() for a single sample """
+        norm = math.sqrt(w * w + x * x + y * y + z * z)
+        w, x, y, z = w / norm, x / norm, y / norm, z / norm
+        direction = rotate_vector(w, x, y, z, self.boresight)
+        origin = self.position
+        if self.has_lever_arm:
+            arm = rotate_vector(w, x, y, z, self.lever_arm)
+            origin = (origin[0] + arm[0], origin[1] + arm[1], origin[2] + arm[2])
+
+        slope = direction[self.axis]
+        if abs(slope) <= PARALLEL_EPS:
+            return None
+        t = (self.offset - origin[self.axis]) / slope
+        if self.forward_only and t < 0:
+            return None
+        a, b = self.plane_axes
+        return (origin[a] + t * direction[a], origin[b] + t * direction[b])
@@ -0,0 +1,82 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity FIFO of values (scalars or rows) backed by a preallocated NumPy array.
+    Every value is written twice, at i and i + capacity, so the newest n values are
+    always available as one contiguous view without copying.
+    """
+    def __init__(self, capacity, width=None, dtype=float):
+        """
+        :param capacity: Maximum number of values kept; older values are overwritten.
+        :param width: Row length, or None for a buffer of scalars.
+        :param dtype: NumPy dtype of the values.
+        """
+        shape = (2 * capacity,) if width is None else (2 * capacity, width)
+        self.data = np.zeros(shape, dtype=dtype)
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """Append one value in O(1), overwriting the oldest one when full."""
+        self.data[self.index] = value
+        self.data[self.index + self.capacity] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def last(self, n=None):
+        """Return a read-only view of the newest n values (all by default), oldest first."""
+        n = self.count if n is None else min(n, self.count)
+        end = self.index + self.capacity
+        view = self.data[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def newest(self):
+        """Return the most recently appended value."""
+        return self.data[self.index + self.capacity - 1]
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+
+class TimeSeriesBuffer:
+    """
+    Fixed-capacity store of timestamped samples for the live viewers.
+    Memory is allocated once; appends are O(1) and last(n) returns zero-copy views.
+    A view of n samples stays unchanged for the next capacity - n appends, so keep
+    the capacity above the number of samples drawn per frame.
+
+    Appends may come from a websocket thread while the Qt timer reads, so both are
+    guarded by a lock; timestamps and values are always returned for the same samples.
+    """
+    def __init__(self, capacity, channels, dtype=float):
+        self.times = RingBuffer(capacity)
+        self.values = RingBuffer(capacity, channels, dtype)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, timestamp, values):
+        with self.lock:
+            self.times.append(timestamp)
+            self.values.append(values)
+
+    def last(self, n=None):
+        """Return (timestamps, values) views of the newest n samples, oldest first."""
+        with self.lock:
+            return self.times.last(n), self.values.last(n)
+
+    def newest(self):
+        """Return (timestamp, values) of the most recent sample."""
+        with self.lock:
+            return self.times.newest(), self.values.newest()
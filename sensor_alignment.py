@@ -0,0 +1,99 @@
+from collections import deque
+import numpy as np
+from ring_buffer import RingBuffer
+
+
+class SensorAligner:
+    """
+    Builds time-synchronised fusion frames from independently clocked sensors.
+    Every reference (gyro) sample becomes one frame; the interpolated sensors
+    (accel, mag) are linearly interpolated onto its timestamp and the held
+    sensors (orientation) contribute their latest value at or before it.
+
+    A gyro sample waits until every interpolated sensor has a sample at or after
+    its timestamp. If a sensor stops refreshing, samples older than max_delay
+    (relative to the newest gyro sample) are released using the sensor's last
+    value instead of stalling fusion. More than capacity waiting gyro samples
+    are released the same way, so a gyro faster than capacity / max_delay
+    cannot push samples out before they age. A held sensor that has not sent
+    anything yet holds frames back for max_delay at most; they are then
+    released without its key.
+
+    :param reference: Key of the sensor that clocks the frames.
+    :param interpolated: Keys of the sensors interpolated onto the reference timestamps.
+    :param held: Keys of the sensors whose latest value is attached as is.
+    :param capacity: Samples kept per sensor, and gyro samples kept waiting.
+    :param max_delay: Maximum wait in timestamp ticks (default 50 ms in nanoseconds).
+    """
+    def __init__(self, reference='gyro', interpolated=('accel', 'mag'), held=('orientation',),
+                 capacity=64, max_delay=50_000_000):
+        self.reference = reference
+        self.interpolated = tuple(interpolated)
+        self.held = tuple(held)
+        self.max_delay = max_delay
+        self.capacity = capacity
+        self.times = {key: RingBuffer(capacity, dtype=np.int64) for key in self.interpolated + self.held}
+        self.values = {key: RingBuffer(capacity, 3) for key in self.interpolated + self.held}
+        self.pending = deque()
+
+    def add(self, key, timestamp, values):
+        """Store one sample; values are copied."""
+        if key == self.reference:
+            self.pending.append((timestamp, np.array(values, dtype=float)))
+        elif key in self.times:
+            self.times[key].append(timestamp)
+            self.values[key].append(values)
+
+    def interpolate(self, key, timestamps):
+        """Values of an interpolated sensor at the given timestamps, shape [len(timestamps), 3]."""
+        times = self.times[key].last()
+        values = self.values[key].last()
+        # Interpolate relative to the newest sample to keep nanosecond timestamps exact in float64
+        origin = times[-1]
+        sample_times = (times - origin).astype(float)
+        query_times = (np.asarray(timestamps) - origin).astype(float)
+        return np.column_stack([np.interp(query_times, sample_times, values[:, axis]) for axis in range(values.shape[1])])
+
+    def held_value(self, key, timestamp):
+        """Latest value of a held sensor at or before timestamp, or its oldest value."""
+        times = self.times[key].last()
+        position = max(np.searchsorted(times, timestamp, side='right') - 1, 0)
+        return self.values[key].last()[position].copy()
+
+    def frames(self):
+        """Return the frames that can be completed now, oldest first."""
+        if not self.pending:
+            return []
+        if any(len(self.times[key]) == 0 for key in self.interpolated):
+            # Nothing to interpolate from yet, keep only the newest samples
+            while len(self.pending) > self.capacity:
+                self.pending.popleft()
+            return []
+
+        stale = self.pending[-1][0] - self.max_delay
+        if any(len(self.times[key]) == 0 for key in self.held):
+            # Wait for a held sensor that has never arrived, but no longer than max_delay
+            horizon = stale
+        else:
+            horizon = min(self.times[key].newest() for key in self.interpolated)
+            # Release stale samples even if a sensor has stopped refreshing
+            horizon = max(horizon, stale)
+
+        ready = []
+        while self.pending and (self.pending[0][0] <= horizon or len(self.pending) > self.capacity):
+            ready.append(self.pending.popleft())
+        if not ready:
+            return []
+
+        timestamps = [timestamp for timestamp, _ in ready]
+        interpolated = {key: self.interpolate(key, timestamps) for key in self.interpolated}
+        frames = []
+        for i, (timestamp, gyro) in enumerate(ready):
+            frame = {'timestamp': timestamp, self.reference: gyro}
+            for key in self.interpolated:
+                frame[key] = interpolated[key][i]
+            for key in self.held:
+                if len(self.times[key]):
+                    frame[key] = self.held_value(key, timestamp)
+            frames.append(frame)
+        return frames
@@ -0,0 +1,144 @@
+import queue
+import struct
+import threading
+import time
+import numpy as np
+
+# File layout: a fixed 64 byte header followed by fixed-size little-endian records
+MAGIC = b'SENSREC1'
+HEADER_SIZE = 64
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('gyro', '<f8', (3,)),
+    ('accel', '<f8', (3,)),
+    ('mag', '<f8', (3,)),
+    ('orientation', '<f8', (3,)),
+])
+SENSOR_FIELDS = ('gyro', 'accel', 'mag', 'orientation')
+
+
+def make_header():
+    return (MAGIC + struct.pack('<II', HEADER_SIZE, RECORD_DTYPE.itemsize)).ljust(HEADER_SIZE, b'\0')
+
+
+class SensorRecorder:
+    """
+    Append-only binary recorder for merged sensor samples.
+    Samples are copied into a preallocated batch and full batches are written by a
+    background thread, so record() never waits on disk I/O. A partial batch is
+    handed over as well once flush_interval seconds have passed since the last
+    flush, so a live reader of the file is never far behind.
+
+    Usage:
+        recorder = SensorRecorder('session.rec')
+        handler.add_callback(recorder.record)   # ahrsPhoneSensor.SensorDataHandler
+        ...
+        recorder.close()
+    """
+    def __init__(self, path, batch_size=1024, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.next_flush = time.monotonic() + flush_interval
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(make_header())
+            self.file.flush()
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+        self.recorded = 0
+        self._new_batch()
+
+    def _new_batch(self):
+        self.batch = np.empty(self.batch_size, dtype=RECORD_DTYPE)
+        self.count = 0
+        self._timestamps = self.batch['timestamp']
+        self._fields = {key: self.batch[key] for key in SENSOR_FIELDS}
+
+    def record(self, data):
+        """
+        Append one sample.
+        :param data: Dict with 'timestamp' and any of 'gyro', 'accel', 'mag', 'orientation'.
+                     Missing sensors are stored as NaN.
+        """
+        i = self.count
+        self._timestamps[i] = data['timestamp']
+        for key, column in self._fields.items():
+            values = data.get(key)
+            column[i] = np.nan if values is None else values
+        self.count = i + 1
+        self.recorded += 1
+        if self.count == self.batch_size or time.monotonic() >= self.next_flush:
+            self.flush()
+
+    def record_batch(self, batch):
+        """
+        Append many samples at once.
+        :param batch: Dict with 'timestamp' [N] and any of 'gyro', 'accel', 'mag', 'orientation' [N, 3],
+                      e.g. an EulerSerial batch. Missing sensors are stored as NaN.
+        """
+        timestamps = batch['timestamp']
+        start = 0
+        while start < len(timestamps):
+            i = self.count
+            n = min(len(timestamps) - start, self.batch_size - i)
+            self._timestamps[i:i + n] = timestamps[start:start + n]
+            for key, column in self._fields.items():
+                values = batch.get(key)
+                column[i:i + n] = np.nan if values is None else values[start:start + n]
+            self.count = i + n
+            self.recorded += n
+            start += n
+            if self.count == self.batch_size:
+                self.flush()
+        if time.monotonic() >= self.next_flush:
+            self.flush()
+
+    async def on_data(self, data):
+        """ Coroutine form of record() for EulerSerial.set_on_data_handler """
+        self.record(data)
+
+    def flush(self):
+        """ Hand the current partial batch to the writer thread """
+        self.next_flush = time.monotonic() + self.flush_interval
+        if self.count:
+            self.queue.put(self.batch[:self.count])
+            self._new_batch()
+
+    def _write_loop(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            self.file.write(batch.tobytes())
+            self.file.flush()
+
+    def close(self):
+        """ Write any pending samples and close the file """
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+        self.file.close()
+
+
+def open_recording(path):
+    """
+    Memory-map a recording as a read-only structured array.
+    Fields are zero-copy views, e.g. recording['gyro'] has shape [N, 3].
+    A record that is still being written at the end of the file is ignored.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+        f.seek(0, 2)
+        size = f.tell()
+    if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a sensor recording")
+    header_size, record_size = struct.unpack('<II', header[8:16])
+    if record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} has records of {record_size} bytes, expected {RECORD_DTYPE.itemsize}")
+
+    count = (size - header_size) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=header_size, shape=(count,))
@@ -0,0 +1,103 @@
+import asyncio
+import time
+import numpy as np
+from sensor_recorder import open_recording
+
+
+class SensorReplay:
+    """
+    Replays a SensorRecorder session through the same callback interfaces as
+    ahrsPhoneSensor.SensorDataHandler (add_callback/connect) and
+    euler_serial.EulerSerial (set_on_data_handler/start_reading).
+
+    :param path: Recording written by sensor_recorder.SensorRecorder.
+    :param speed: 1.0 for real time, N for N times faster, None to replay as fast as possible.
+    :param timestamp_scale: Timestamp ticks per second (1e9 for phone data, 1e6 for serial data).
+    :param loop_count: Number of passes over the recording.
+    """
+    def __init__(self, path, speed=1.0, timestamp_scale=1e9, loop_count=1, debugLevel=0):
+        self.path = path
+        self.speed = speed
+        self.timestamp_scale = timestamp_scale
+        self.loop_count = loop_count
+        self.debugLevel = debugLevel
+        self.callbacks = []
+        self.on_data = None
+        self.running = False
+        self.replayed = 0
+        self.elapsed = 0.0
+
+    def log(self, message, level=1):
+        if level <= self.debugLevel:
+            print(message)
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def set_on_data_handler(self, handler):
+        self.on_data = handler
+
+    async def notify_callbacks(self, data):
+        for callback in self.callbacks:
+            if asyncio.iscoroutinefunction(callback):
+                await callback(data)
+            else:
+                callback(data)
+        if self.on_data:
+            await self.on_data(data)
+
+    async def connect(self):
+        """ Replay the whole recording, pacing samples by their timestamps """
+        recording = open_recording(self.path)
+        if len(recording) == 0:
+            self.log(f"Nothing to replay in {self.path}", 1)
+            return
+        timestamps = recording['timestamp']
+        gyro, accel, mag, orientation = (recording[key] for key in ('gyro', 'accel', 'mag', 'orientation'))
+        has_orientation = ~np.isnan(orientation[:, 0])
+        # Seconds from the first sample, scaled by the replay speed
+        if self.speed:
+            offsets = (timestamps - timestamps[0]) / self.timestamp_scale / self.speed
+
+        self.log(f"Replaying {len(recording)} samples from {self.path}", 1)
+        self.running = True
+        self.replayed = 0
+        start = time.perf_counter()
+        for _ in range(self.loop_count):
+            pass_start = time.perf_counter()
+            for i in range(len(recording)):
+                if not self.running:
+                    break
+                if self.speed:
+                    # Only sleep once we are more than a millisecond ahead, so high
+                    # rate recordings are delivered in small bursts
+                    ahead = offsets[i] - (time.perf_counter() - pass_start)
+                    if ahead > 0.001:
+                        await asyncio.sleep(ahead)
+                elif i % 1000 == 0:
+                    await asyncio.sleep(0)  # Let the rest of the event loop run
+
+                data = {
+                    'timestamp': int(timestamps[i]),
+                    'gyro': gyro[i],
+                    'accel': accel[i],
+                    'mag': mag[i],
+                }
+                if has_orientation[i]:
+                    data['orientation'] = orientation[i]
+                await self.notify_callbacks(data)
+                self.replayed += 1
+
+        self.elapsed = time.perf_counter() - start
+        self.running = False
+        rate = self.replayed / self.elapsed if self.elapsed else 0.0
+        self.log(f"Replayed {self.replayed} samples in {self.elapsed:.3f} s ({rate:.0f} samples/s)", 1)
+
+    async def start_reading(self):
+        asyncio.create_task(self.connect())
+
+    async def stop_reading(self):
+        self.running = False
+
+    async def close(self):
+        await self.stop_reading()
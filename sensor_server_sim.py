@@ -0,0 +1,164 @@
+import asyncio
+import json
+import math
+import random
+import time
+from urllib.parse import urlparse, parse_qs
+import websockets
+
+ALL_SENSORS = [
+    "android.sensor.accelerometer",
+    "android.sensor.gyroscope",
+    "android.sensor.magnetic_field",
+    "android.sensor.orientation",
+    "android.sensor.rotation_vector",
+]
+
+GRAVITY = 9.80665
+EARTH_FIELD = (20.0, 0.0, -40.0)  # Magnetic field in uT, roughly what the phones report indoors
+
+
+def device_attitude(t):
+    """ Synthetic slow wobble: yaw, pitch, roll in radians and their rates in rad/s """
+    yaw = 0.8 * math.sin(0.3 * t)
+    pitch = 0.4 * math.sin(0.5 * t)
+    roll = 0.3 * math.sin(0.7 * t)
+    rates = (0.3 * 0.7 * math.cos(0.7 * t), 0.4 * 0.5 * math.cos(0.5 * t), 0.8 * 0.3 * math.cos(0.3 * t))
+    return yaw, pitch, roll, rates
+
+
+def rotate_to_device(v, yaw, pitch, roll):
+    """ Express a world-frame vector in the device frame (ZYX Euler angles) """
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cr, sr = math.cos(roll), math.sin(roll)
+    x, y, z = v
+    # Transpose of Rz(yaw) @ Ry(pitch) @ Rx(roll)
+    x1, y1 = cy * x + sy * y, -sy * x + cy * y
+    x2, z2 = cp * x1 - sp * z, sp * x1 + cp * z
+    return [x2, cr * y1 + sr * z2, -sr * y1 + cr * z2]
+
+
+def synthesize(sensor_type, t, noise=0.01):
+    """ Return the 'values' list of one synthetic reading of sensor_type at time t (s) """
+    yaw, pitch, roll, rates = device_attitude(t)
+    if sensor_type == "android.sensor.accelerometer":
+        values = rotate_to_device((0.0, 0.0, GRAVITY), yaw, pitch, roll)
+    elif sensor_type == "android.sensor.gyroscope":
+        values = list(rates)
+    elif sensor_type == "android.sensor.magnetic_field":
+        values = rotate_to_device(EARTH_FIELD, yaw, pitch, roll)
+    elif sensor_type == "android.sensor.orientation":
+        return [math.degrees(yaw) % 360, math.degrees(pitch), math.degrees(roll)]
+    elif sensor_type == "android.sensor.rotation_vector":
+        cy, sy = math.cos(yaw / 2), math.sin(yaw / 2)
+        cp, sp = math.cos(pitch / 2), math.sin(pitch / 2)
+        cr, sr = math.cos(roll / 2), math.sin(roll / 2)
+        # [x, y, z, w, heading accuracy] like the Android rotation vector
+        return [
+            sr * cp * cy - cr * sp * sy,
+            cr * sp * cy + sr * cp * sy,
+            cr * cp * sy - sr * sp * cy,
+            cr * cp * cy + sr * sp * sy,
+            -1.0,
+        ]
+    else:
+        return [0.0, 0.0, 0.0]
+    return [value + random.gauss(0.0, noise) for value in values]
+
+
+class SensorServerSimulator:
+    """
+    Local stand-in for the Android SensorServer app.
+    Serves /sensors/connect?types=[...] and /sensor/connect?type=... and streams
+    synthetic readings as {"type", "values", "timestamp"} JSON messages.
+
+    :param rate_hz: Default rate of every sensor stream.
+    :param rates: Optional per-sensor rates, e.g. {"android.sensor.gyroscope": 4000}.
+    :param tick_s: Scheduling tick; all samples due since the last tick are sent together,
+                   which allows rates well above the event loop's sleep resolution.
+    """
+    def __init__(self, host="0.0.0.0", port=8080, rate_hz=200, rates=None, tick_s=0.001, debugLevel=1):
+        self.host = host
+        self.port = port
+        self.rate_hz = rate_hz
+        self.rates = rates or {}
+        self.tick_s = tick_s
+        self.debugLevel = debugLevel
+        self.sessions = 0
+
+    def log(self, message, level=1):
+        if level <= self.debugLevel:
+            print(message)
+
+    def parse_sensor_types(self, path):
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        if url.path == "/sensors/connect" and "types" in query:
+            return json.loads(query["types"][0])
+        if url.path == "/sensor/connect" and "type" in query:
+            return [query["type"][0]]
+        return None
+
+    async def stream(self, websocket, sensor_type, start, counters):
+        """ Send one sensor type at its configured rate until the client disconnects """
+        rate = self.rates.get(sensor_type, self.rate_hz)
+        sent = 0
+        try:
+            while True:
+                due = int((time.perf_counter() - start) * rate)
+                while sent < due:
+                    t = sent / rate
+                    message = json.dumps({
+                        "type": sensor_type,
+                        "values": synthesize(sensor_type, t),
+                        "timestamp": int(t * 1e9),
+                    })
+                    await websocket.send(message)
+                    sent += 1
+                counters[sensor_type] = sent
+                await asyncio.sleep(self.tick_s)
+        except websockets.ConnectionClosed:
+            counters[sensor_type] = sent
+
+    async def handler(self, websocket, path=None):
+        # websockets >= 13 passes only the connection; older versions also pass the path
+        if path is None:
+            path = websocket.request.path
+        sensor_types = self.parse_sensor_types(path)
+        if not sensor_types:
+            self.log(f"Rejecting unknown request: {path}", 1)
+            await websocket.close(code=1008, reason="Unknown sensor request")
+            return
+
+        self.sessions += 1
+        session = self.sessions
+        self.log(f"Session {session} connected: {sensor_types}", 1)
+        start = time.perf_counter()
+        counters = {}
+        tasks = [asyncio.create_task(self.stream(websocket, sensor_type, start, counters)) for sensor_type in sensor_types]
+        try:
+            # A stream only ends when the client disconnects or it fails
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    self.log(f"Session {session} stream failed: {task.exception()!r}", 1)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            elapsed = time.perf_counter() - start
+            total = sum(counters.values())
+            self.log(f"Session {session} closed after {elapsed:.1f} s: {total} messages ({total / elapsed:.0f} msg/s)", 1)
+
+    async def main(self):
+        async with websockets.serve(self.handler, self.host, self.port):
+            self.log(f"Simulated SensorServer on ws://{self.host}:{self.port}", 1)
+            await asyncio.Future()  # Run forever
+
+
+if __name__ == "__main__":
+    # Example usage: point ahrs_emit / ahrsMain at "127.0.0.1:8080"
+    simulator = SensorServerSimulator("0.0.0.0", 8080, rate_hz=1000)
+    asyncio.run(simulator.main())
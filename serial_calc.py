@@ -8,6 +8,8 @@ import pyqtgraph as pg
 import pyqtgraph.opengl as gl
 import math
 import matplotlib.pyplot as plt
+from ring_buffer import RingBuffer
+from pointing import euler_hits, relative_vector
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self, *args, **kwargs):
@@ -43,10 +45,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
     
         
-        #shared data
-        self.x_data = []
-       
-        self.z_data = []
+        #shared data: (x, z) plane hits, bounded to keep memory flat
+        self.hits = RingBuffer(1000, 2)
 
         self.timer = QtCore.QTimer()
         self.timer.setInterval(50)
@@ -60,19 +60,19 @@ class MainWindow(QtWidgets.QMainWindow):
 
     
     def update_plot_data(self):
-        if not self.x_data or not self.z_data:  # Check if lists are empty
+        if not len(self.hits):  # Check if the buffer is empty
             return
 
-        limit = -100  # limit the number of points to display
+        limit = 100  # limit the number of points to display
 
-        # Get max and min values safely
-        max_x = max(self.x_data)
-        max_z = max(self.z_data)
-        min_x = min(self.x_data)
-        min_z = min(self.z_data)
+        # Get max and min values over the stored history
+        hits = self.hits.last()
+        max_x, max_z = hits.max(axis=0)
+        min_x, min_z = hits.min(axis=0)
 
         # Update the data in the plot
-        self.x_data_line.setData(self.x_data[limit:], self.z_data[limit:])  
+        hits = self.hits.last(limit)
+        self.x_data_line.setData(hits[:, 0], hits[:, 1])  
         self.graphWidget.setXRange(min_x - 5, max_x + 5)
         self.graphWidget.setYRange(min_z - 5, max_z + 5)
 
@@ -106,150 +106,24 @@ class MainWindow(QtWidgets.QMainWindow):
         ##yaw -= yaw_rot_rate * (epoch_time)
 
         # use the relative vector function to get the intersection point and plot it
-        x, z = relative_vector(0, -2, -2, math.radians(yaw),math.radians(roll),math.radians(pitch),200)
+        hits, valid = relative_vector(0, -2, -2, math.radians(yaw),math.radians(roll),math.radians(pitch),200)
 
-       
-        # limit lists data to 1000 items 
-        self.x_data.append(x)
-        self.z_data.append(z)
+        # Skip samples where the laser is parallel to the plane
+        if valid[0]:
+            self.hits.append(hits[0])
 
         
 
     def calculate_laser_intersection(self, yaw, pitch, roll):
-        # Convert degrees to radians
-        yaw_rad = math.radians(yaw)
-        pitch_rad = math.radians(pitch)
-        roll_rad = math.radians(roll)
-
-        # Define the transformation for rotations using NumPy arrays
-        R_yaw = np.array([
-            [np.cos(yaw_rad), -np.sin(yaw_rad), 0],
-            [np.sin(yaw_rad), np.cos(yaw_rad), 0],
-            [0, 0, 1]
-        ])
-        R_pitch = np.array([
-            [np.cos(pitch_rad), 0, np.sin(pitch_rad)],
-            [0, 1, 0],
-            [-np.sin(pitch_rad), 0, np.cos(pitch_rad)]
-        ])
-        R_roll = np.array([
-            [1, 0, 0],
-            [0, np.cos(roll_rad), -np.sin(roll_rad)],
-            [0, np.sin(roll_rad), np.cos(roll_rad)]
-        ])
-
-        direction = np.array([0, 1, 0])  # Initial direction vector pointing upwards from the cube
-        
-        direction = R_yaw @ R_pitch @ R_roll @ direction
-
-        dz = direction[2]
-        if dz == 0:
-            return None  # Prevent division by zero
-
-        t = (-2500 - (-0.5)) / dz  # Calculate intersection with a distant plane at z = -2500
-        x = 0.5 + t * direction[0]
-        y = 1 + t * direction[1]
-
+        # Laser along +y from (0.5, 1, -0.5), hitting a distant plane at z = -2500
+        hits, valid = euler_hits(yaw, pitch, roll, boresight=(0, 1, 0), position=(0.5, 1, -0.5),
+                                 axis=2, offset=-2500, degrees=True)
+        if not valid[0]:
+            return None  # Laser parallel to the plane
+        x, y = hits[0]
         return (x, y, -2500)  # Return the 3D coordinates of the intersection point
 
 
-# Function to create a rotation matrix about the z-axis
-def rotation_matrix_z(theta):
-    return np.array([
-        [np.cos(theta), -np.sin(theta), 0],
-        [np.sin(theta), np.cos(theta), 0],
-        [0, 0, 1]
-    ])
-
-# Function to create a rotation matrix about the y-axis
-def rotation_matrix_y(phi):
-    return np.array([
-        [np.cos(phi), 0, np.sin(phi)],
-        [0, 1, 0],
-        [-np.sin(phi), 0, np.cos(phi)]
-    ])
-
-# Function to create a rotation matrix about the x-axis
-def rotation_matrix_x(gamma):
-    return np.array([
-        [1, 0, 0],
-        [0, np.cos(gamma), -np.sin(gamma)],
-        [0, np.sin(gamma), np.cos(gamma)]
-    ])
-
-# Function to rotate a point by given angles theta, phi, gamma
-def rotate_point(x, y, z, theta, phi, gamma):
-    point = np.array([x, y, z])
-    Rz = rotation_matrix_z(theta)
-    Ry = rotation_matrix_y(phi)
-    Rx = rotation_matrix_x(gamma)
-    # Combine the rotations
-    # R = np.dot(Rz, np.dot(Ry, Rx))
-    new_point = Rz @ Ry @ Rx @ point
-    # Apply the rotation to the point
-    
-
-    return new_point
-
-# Example usage
-theta = np.radians(0)  # Convert degrees to radians
-phi = np.radians(0)
-gamma = np.radians(90)
-x, y, z = 0, 1, 0  # Coordinates of the point to be rotated
-
-x1,y1,z1 = rotate_point(0, 0, 1, theta, phi, gamma)
-x2, y2, z2 = rotate_point(0, -1, 1, theta, phi, gamma)
-
-new_coordinates = rotate_point(x, y, z, theta, phi, gamma)
-
-print("New coordinates:", new_coordinates)
-
-
-def project_line_on_plane(x1, y1, z1, x2, y2, z2, p):
-    # Check if the line is parallel to the plane
-    if y2 - y1 == 0:
-        if y1 == p:
-            print("The line is on the plane.")
-        else:
-            print("The line is parallel to the plane and does not intersect it.")
-        return None
-    
-    # Calculate the parameter t where the line intersects the plane y = p
-    t = (p - y1) / (y2 - y1)
-    
-    # Calculate the x and z coordinates at the intersection
-    x = x1 + t * (x2 - x1)
-    z = z1 + t * (z2 - z1)
-    
-    # Return the coordinates of the intersection point on the plane y = p
-    return (x, z)
-
-
-
-
-
-# Define function that gives a vector relative to anotehr vector in 3D
-def relative_vector(xd, yd, zd, yaw, roll, pitch ,p ):
-    x1 = -xd 
-    x2= - xd
-    y1 = -yd-1
-    y2 = -yd
-    z1 = -zd
-    z2 = -zd
-
-
-   # print ("0:" , x1, y1, z1)
-    x1, y1, z1 = rotate_point(x1, y1, z1, yaw, roll, pitch)
-    #print ("1:" , x1, y1, z1)
-    x2, y2, z2 = rotate_point(x2, y2, z2, yaw, roll, pitch)
-    #print ("2:" , x2, y2, z2)
-    x3, z3 = project_line_on_plane(x1, y1, z1, x2, y2, z2, p)
-    #print ("3:" , x3, z3)
-
-
-    return x3, z3
-
-
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
@@ -0,0 +1,176 @@
+"""
+Pseudo-terminal stand-in for the IMU board, so EulerSerial can be run and
+benchmarked without hardware.
+
+Usage:
+    emulator = FirmwareEmulator(rate_hz=1000, protocol='ascii')
+    emulator.start()
+    reader = EulerSerial(emulator.port, baud_rate=921600)
+    ...
+    emulator.close()
+"""
+import os
+import random
+import select
+import tempfile
+import threading
+import time
+import tty
+import numpy as np
+from sensor_server_sim import synthesize
+from serial_parser import encode_samples, encode_text
+
+BOOT_BANNER = (
+    "Calibrating Accelerometer and Gyroscope",
+    "Accelerometer & Gyro calibration complete",
+    "Acc Bias: 0.012 -0.034 0.021 Gyro Bias: 0.41 -0.27 0.08",
+)
+SAMPLE_POOL_SIZE = 1000
+
+
+def make_sample_pool(size=SAMPLE_POOL_SIZE, rate_hz=1000):
+    """ [size, 9] accel, gyro, mag values of a synthetic motion, reused cyclically """
+    pool = np.empty((size, 9))
+    for i in range(size):
+        t = i / rate_hz
+        pool[i, 0:3] = synthesize("android.sensor.accelerometer", t)
+        pool[i, 3:6] = synthesize("android.sensor.gyroscope", t)
+        pool[i, 6:9] = synthesize("android.sensor.magnetic_field", t)
+    return pool
+
+
+class FirmwareEmulator:
+    """
+    Emulates the firmware on a pseudo-terminal pair: the boot calibration banner,
+    data lines (or binary frames) at rate_hz, periodic compass calibration
+    banners and random garbage bytes.
+
+    EulerSerial opens `port`, a symlink that follows the current pty, so close()
+    followed by start() looks like the board being unplugged and plugged back in.
+
+    :param rate_hz: Samples per second, or None to write as fast as the reader takes them.
+    :param protocol: 'ascii' or 'binary', see serial_parser.
+    :param calibration_every_s: Seconds between compass calibration banners, None for never.
+    :param garbage_every: Write a burst of random bytes every this many samples, 0 for never.
+    :param block_size: Samples encoded and written per write call.
+    """
+    def __init__(self, rate_hz=1000, protocol='ascii', calibration_every_s=None, garbage_every=0,
+                 block_size=64, port=None, seed=0):
+        if protocol not in ('ascii', 'binary'):
+            raise ValueError(f"Unknown protocol {protocol!r}")
+        self.rate_hz = rate_hz
+        self.protocol = protocol
+        self.calibration_every_s = calibration_every_s
+        self.garbage_every = garbage_every
+        self.block_size = block_size
+        self.port = port or os.path.join(tempfile.gettempdir(), f"ttyIMU-{os.getpid()}-{id(self)}")
+        self.random = random.Random(seed)
+        self.pool = make_sample_pool()
+        self.pool_text = [' '.join(f"{value:.4f}" for value in row) for row in self.pool]
+        self.master = None
+        self.slave = None
+        self.thread = None
+        self.running = False
+        # Counters kept across reconnects
+        self.sent = 0
+        self.bytes_sent = 0
+        self.garbage_sent = 0
+        self.start_time = None
+
+    def timestamp_us(self):
+        """ Firmware clock in microseconds since the emulator was first started """
+        return (time.perf_counter_ns() - self.start_time) // 1000
+
+    def start(self):
+        if self.start_time is None:
+            self.start_time = time.perf_counter_ns()
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        # Non-blocking, so close() can stop a writer whose reader has stalled
+        os.set_blocking(self.master, False)
+        if os.path.lexists(self.port):
+            os.remove(self.port)
+        os.symlink(os.ttyname(self.slave), self.port)
+        self.running = True
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """ Stop writing and close the pty, like unplugging the board """
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        if os.path.lexists(self.port):
+            os.remove(self.port)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def encode_block(self, count):
+        now = self.timestamp_us()
+        if self.rate_hz:
+            # Spread the block over the interval it covers, ending now
+            timestamps = now - (np.arange(count)[::-1] * 1e6 / self.rate_hz).astype(np.int64)
+        else:
+            timestamps = np.full(count, now, dtype=np.int64)
+        indices = (self.sent + np.arange(count)) % len(self.pool)
+        if self.protocol == 'binary':
+            values = self.pool[indices]
+            return encode_samples(timestamps, values[:, 0:3], values[:, 3:6], values[:, 6:9])
+        pool_text = self.pool_text
+        return ''.join(f"{timestamp} {pool_text[index]}\r\n"
+                       for timestamp, index in zip(timestamps.tolist(), indices.tolist())).encode()
+
+    def encode_status(self, text):
+        return encode_text(text) if self.protocol == 'binary' else (text + "\r\n").encode()
+
+    def write(self, data):
+        view = memoryview(data)
+        while view and self.running:
+            try:
+                written = os.write(self.master, view)
+            except BlockingIOError:
+                # The reader is behind; wait for room in the pty buffer
+                select.select([], [self.master], [], 0.05)
+                continue
+            except OSError:
+                # The pty was closed under us
+                self.running = False
+                return
+            view = view[written:]
+        self.bytes_sent += len(data)
+
+    def _write_loop(self):
+        for line in BOOT_BANNER:
+            self.write(self.encode_status(line))
+
+        started = time.perf_counter()
+        session_sent = 0
+        next_calibration = started + self.calibration_every_s if self.calibration_every_s else None
+        next_garbage = self.sent + self.garbage_every if self.garbage_every else None
+        while self.running:
+            now = time.perf_counter()
+            if self.rate_hz:
+                due = int((now - started) * self.rate_hz) - session_sent
+                if due <= 0:
+                    time.sleep(0.0005)
+                    continue
+                count = min(due, self.block_size)
+            else:
+                count = self.block_size
+
+            self.write(self.encode_block(count))
+            self.sent += count
+            session_sent += count
+
+            if next_garbage is not None and self.sent >= next_garbage:
+                garbage = bytes(self.random.randrange(256) for _ in range(self.random.randrange(1, 48)))
+                self.write(garbage + b"\r\n")
+                self.garbage_sent += 1
+                next_garbage += self.garbage_every
+            if next_calibration is not None and now >= next_calibration:
+                self.write(self.encode_status("Start compass calibration"))
+                self.write(self.encode_status("End of compass calibration"))
+                next_calibration += self.calibration_every_s
@@ -0,0 +1,299 @@
+import binascii
+import numpy as np
+
+# Data line: "<timestamp us> ax ay az gx gy gz mx my mz", whitespace separated
+DATA_FIELDS = 10
+# Status lines are recognised by their prefix and reported as (kind, text) events
+STATUS_PREFIXES = (
+    ("Start compass calibration", 'calibration_start'),
+    ("End of compass calibration", 'calibration_end'),
+    ("Calibrating Accelerometer and Gyroscope", 'imu_calibration_start'),
+    ("Accelerometer & Gyro calibration complete", 'imu_calibration_end'),
+    ("Acc Bias", 'bias'),
+)
+# A partial line longer than this is noise without line breaks and is dropped
+MAX_LINE_LENGTH = 4096
+
+
+def make_batch(values):
+    """
+    Split parsed data rows into the batch layout handed to EulerSerial batch handlers:
+    'timestamp' int64 [N] (microseconds) and 'accel', 'gyro', 'mag' float [N, 3].
+    """
+    values = values.reshape(-1, DATA_FIELDS)
+    return {
+        'timestamp': values[:, 0].astype(np.int64),
+        'accel': values[:, 1:4],
+        'gyro': values[:, 4:7],
+        'mag': values[:, 7:10],
+    }
+
+
+def classify_status(text):
+    for prefix, kind in STATUS_PREFIXES:
+        if text.startswith(prefix):
+            return kind
+    return 'garbage'
+
+
+class AsciiLineParser:
+    """
+    Incremental parser for the firmware's ASCII output.
+    feed() takes raw chunks of any size and returns events in stream order:
+        ('data', batch)   one batch (see make_batch) per run of consecutive data lines
+        (kind, text)      a status line, kind from STATUS_PREFIXES, or 'garbage'
+    Data lines are converted to floats with a single NumPy call per run; lines are
+    only parsed one by one when a run contains a malformed line.
+    """
+    def __init__(self):
+        self.remainder = b''
+        self.samples = 0
+        self.garbage = 0
+
+    def reset(self):
+        """ Forget any partial line, e.g. after a reconnect """
+        self.remainder = b''
+
+    def feed(self, chunk):
+        data = self.remainder + chunk if self.remainder else chunk
+        end = data.rfind(b'\n') + 1
+        self.remainder = data[end:]
+        events = []
+        if len(self.remainder) > MAX_LINE_LENGTH:
+            self.garbage += 1
+            events.append(('garbage', self.remainder[:80].decode('utf-8', 'replace')))
+            self.remainder = b''
+        if end:
+            events[:0] = self.parse_lines(data[:end].split(b'\n')[:-1])
+        return events
+
+    def parse_lines(self, lines):
+        events = []
+        run = []
+        for line in lines:
+            if line.lstrip()[:1].isdigit():
+                run.append(line)
+                continue
+            text = line.decode('utf-8', 'replace').strip()
+            if not text:
+                continue
+            if run:
+                self.parse_data(run, events)
+                run = []
+            kind = classify_status(text)
+            if kind == 'garbage':
+                self.garbage += 1
+            events.append((kind, text))
+        if run:
+            self.parse_data(run, events)
+        return events
+
+    def parse_data(self, lines, events):
+        tokens = b' '.join(lines).split()
+        values = None
+        if len(tokens) == DATA_FIELDS * len(lines):
+            try:
+                values = np.array(tokens, dtype=float)
+            except ValueError:
+                pass
+        garbage = []
+        if values is None:
+            # Slow path: find the malformed lines and keep the rest
+            rows = []
+            for line in lines:
+                fields = line.split()
+                try:
+                    if len(fields) != DATA_FIELDS:
+                        raise ValueError
+                    rows.append(np.array(fields, dtype=float))
+                except ValueError:
+                    garbage.append(line.decode('utf-8', 'replace').strip())
+            values = np.array(rows).reshape(-1, DATA_FIELDS)
+        if len(values):
+            batch = make_batch(values)
+            self.samples += len(batch['timestamp'])
+            events.append(('data', batch))
+        self.garbage += len(garbage)
+        events.extend(('garbage', text) for text in garbage)
+
+
+# Binary framing, all little-endian:
+#   sync    2 bytes  0xA5 0x5A
+#   type    u8       FRAME_SAMPLE or FRAME_TEXT
+#   length  u8       payload length
+#   payload          FRAME_SAMPLE: u32 timestamp (us, wraps), 9 x f32 accel, gyro, mag
+#                    FRAME_TEXT: UTF-8 status line, e.g. "Start compass calibration"
+#   crc     u16      CRC-16/CCITT-FALSE of type, length and payload
+SYNC = b'\xa5\x5a'
+FRAME_SAMPLE = 0x01
+FRAME_TEXT = 0x02
+FRAME_HEADER_SIZE = 4
+FRAME_CRC_SIZE = 2
+SAMPLE_PAYLOAD_DTYPE = np.dtype([('timestamp', '<u4'), ('values', '<f4', (9,))])
+SAMPLE_FRAME_DTYPE = np.dtype([
+    ('sync', 'S2'),
+    ('type', 'u1'),
+    ('length', 'u1'),
+    ('payload', SAMPLE_PAYLOAD_DTYPE),
+    ('crc', '<u2'),
+])
+SAMPLE_FRAME_SIZE = SAMPLE_FRAME_DTYPE.itemsize
+
+
+def crc16(data):
+    """ CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) of a bytes-like object """
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def crc16_frames(data, offset, count):
+    """ crc16 of the checked part (type, length, payload) of count back-to-back sample frames """
+    view = memoryview(data)
+    size = SAMPLE_FRAME_SIZE - len(SYNC) - FRAME_CRC_SIZE
+    starts = range(offset + len(SYNC), offset + len(SYNC) + count * SAMPLE_FRAME_SIZE, SAMPLE_FRAME_SIZE)
+    return np.fromiter((binascii.crc_hqx(view[start:start + size], 0xFFFF) for start in starts),
+                       dtype=np.uint16, count=count)
+
+
+def encode_frame(frame_type, payload):
+    body = bytes((frame_type, len(payload))) + payload
+    return SYNC + body + crc16(body).to_bytes(2, 'little')
+
+
+def encode_sample(timestamp, accel, gyro, mag):
+    """ Build one sample frame, as the firmware would send it """
+    payload = np.zeros(1, dtype=SAMPLE_PAYLOAD_DTYPE)
+    payload['timestamp'] = timestamp & 0xFFFFFFFF
+    payload['values'] = list(accel) + list(gyro) + list(mag)
+    return encode_frame(FRAME_SAMPLE, payload.tobytes())
+
+
+def encode_samples(timestamps, accel, gyro, mag):
+    """ Build back-to-back sample frames for [N] timestamps and [N, 3] values in one go """
+    frames = np.zeros(len(timestamps), dtype=SAMPLE_FRAME_DTYPE)
+    frames['sync'] = SYNC
+    frames['type'] = FRAME_SAMPLE
+    frames['length'] = SAMPLE_PAYLOAD_DTYPE.itemsize
+    frames['payload']['timestamp'] = np.asarray(timestamps, dtype=np.int64) & 0xFFFFFFFF
+    frames['payload']['values'] = np.hstack([accel, gyro, mag])
+    frames['crc'] = crc16_frames(frames.tobytes(), 0, len(frames))
+    return frames.tobytes()
+
+
+def encode_text(text):
+    return encode_frame(FRAME_TEXT, text.encode('utf-8')[:255])
+
+
+class BinaryFrameParser:
+    """
+    Incremental parser for the firmware's binary framing (see SYNC above).
+    feed() returns events in the same form as AsciiLineParser.feed().
+
+    Runs of back-to-back sample frames are checked (sync, type, length and CRC)
+    and decoded with NumPy in one go; CRCs use binascii.crc_hqx, which
+    computes CRC-16/CCITT-FALSE in C. A frame that fails any check is dropped by
+    searching for the next sync marker one byte further on, so a corrupted or
+    truncated frame costs at most that frame.
+    The 32-bit firmware timestamps are unwrapped into int64 microseconds.
+    """
+    def __init__(self):
+        self.remainder = b''
+        self.samples = 0
+        self.garbage = 0      # Bytes skipped while searching for a sync marker
+        self.crc_errors = 0
+        self.last_timestamp = None
+        self.timestamp_offset = 0
+
+    def reset(self):
+        self.remainder = b''
+        self.last_timestamp = None
+        self.timestamp_offset = 0
+
+    def feed(self, chunk):
+        data = self.remainder + chunk if self.remainder else chunk
+        events = []
+        runs = []
+        pos = 0
+        while True:
+            start = data.find(SYNC, pos)
+            if start < 0:
+                # Keep a trailing byte that may be the first half of a sync marker
+                keep = 1 if data.endswith(SYNC[:1]) else 0
+                self.garbage += len(data) - pos - keep
+                pos = len(data) - keep
+                break
+            self.garbage += start - pos
+            pos = start
+
+            count = self.sample_run(data, pos, runs)
+            if count:
+                pos += count * SAMPLE_FRAME_SIZE
+                continue
+
+            if len(data) - pos < FRAME_HEADER_SIZE:
+                break
+            frame_type, length = data[pos + 2], data[pos + 3]
+            end = pos + FRAME_HEADER_SIZE + length + FRAME_CRC_SIZE
+            if len(data) < end:
+                break
+            if crc16(data[pos + 2:end - 2]) != int.from_bytes(data[end - 2:end], 'little'):
+                self.crc_errors += 1
+                pos += 1
+                continue
+            if frame_type == FRAME_TEXT:
+                self.flush_samples(runs, events)
+                text = data[pos + FRAME_HEADER_SIZE:end - 2].decode('utf-8', 'replace').strip()
+                events.append((classify_status(text), text))
+            pos = end
+
+        self.flush_samples(runs, events)
+        self.remainder = data[pos:]
+        return events
+
+    def sample_run(self, data, pos, runs):
+        """ Decode the valid sample frames back-to-back from pos; returns how many """
+        count = (len(data) - pos) // SAMPLE_FRAME_SIZE
+        if count == 0:
+            return 0
+        frames = np.frombuffer(data, dtype=SAMPLE_FRAME_DTYPE, count=count, offset=pos)
+        valid = (frames['sync'] == SYNC) & (frames['type'] == FRAME_SAMPLE) & (frames['length'] == SAMPLE_PAYLOAD_DTYPE.itemsize)
+        count = count if valid.all() else int(valid.argmin())
+        if count == 0:
+            return 0
+        crc_ok = crc16_frames(data, pos, count) == frames['crc'][:count]
+        if not crc_ok.all():
+            count = int(crc_ok.argmin())
+        if count:
+            runs.append(frames['payload'][:count])
+        return count
+
+    def flush_samples(self, runs, events):
+        if not runs:
+            return
+        payload = np.concatenate(runs)
+        runs.clear()
+
+        # Unwrap the 32-bit microsecond counter
+        raw = payload['timestamp'].astype(np.int64)
+        previous = raw[0] if self.last_timestamp is None else self.last_timestamp
+        steps = np.diff(raw, prepend=previous)
+        wraps = np.cumsum(steps < -(1 << 31)) << 32
+        self.last_timestamp = raw[-1]
+        timestamps = raw + self.timestamp_offset + wraps
+        self.timestamp_offset += int(wraps[-1])
+
+        values = payload['values'].astype(float)
+        batch = {
+            'timestamp': timestamps,
+            'accel': values[:, 0:3],
+            'gyro': values[:, 3:6],
+            'mag': values[:, 6:9],
+        }
+        self.samples += len(timestamps)
+        events.append(('data', batch))
+
+
+# Serial protocols selectable per port in EulerSerial
+PARSERS = {
+    'ascii': AsciiLineParser,
+    'binary': BinaryFrameParser,
+}
@@ -0,0 +1,81 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+# Shared memory layout: a 64 byte header of int64 counters, then capacity records
+HEADER_SIZE = 64
+WRITE_INDEX, READ_INDEX, CLOSED = 0, 1, 2
+
+
+class SharedRing:
+    """
+    Single-producer, single-consumer ring of fixed-size NumPy records in
+    multiprocessing.shared_memory, for passing samples between processes
+    without pickling.
+
+    The write and read indices only ever grow; a record lives at index % capacity.
+    The producer copies records in before advancing the write index and the
+    consumer copies them out before advancing the read index, so each side only
+    writes its own counter.
+
+    Create the ring in one process with SharedRing(dtype, capacity) and attach
+    to it in the other with SharedRing(dtype, capacity, name=ring.name).
+    """
+    def __init__(self, dtype, capacity, name=None):
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * self.dtype.itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+        self.header = np.ndarray(3, dtype=np.int64, buffer=self.shm.buf)
+        self.records = np.ndarray(capacity, dtype=self.dtype, buffer=self.shm.buf, offset=HEADER_SIZE)
+        if self.owner:
+            self.header[:] = 0
+
+    def __len__(self):
+        return int(self.header[WRITE_INDEX] - self.header[READ_INDEX])
+
+    @property
+    def closed(self):
+        return bool(self.header[CLOSED])
+
+    def mark_closed(self):
+        """ Tell the other side that no more records will be written """
+        self.header[CLOSED] = 1
+
+    def push(self, records):
+        """
+        Append records (a structured array of this ring's dtype) and return how
+        many fitted; the caller decides whether to retry or drop the rest.
+        """
+        write = int(self.header[WRITE_INDEX])
+        free = self.capacity - (write - int(self.header[READ_INDEX]))
+        count = min(len(records), free)
+        start = write % self.capacity
+        first = min(count, self.capacity - start)
+        self.records[start:start + first] = records[:first]
+        self.records[:count - first] = records[first:count]
+        self.header[WRITE_INDEX] = write + count
+        return count
+
+    def pop(self, max_count=None):
+        """ Remove and return up to max_count records (all available by default) as a copy """
+        read = int(self.header[READ_INDEX])
+        count = int(self.header[WRITE_INDEX]) - read
+        if max_count is not None:
+            count = min(count, max_count)
+        start = read % self.capacity
+        first = min(count, self.capacity - start)
+        if first == count:
+            out = self.records[start:start + count].copy()
+        else:
+            out = np.concatenate([self.records[start:], self.records[:count - first]])
+        self.header[READ_INDEX] = read + count
+        return out
+
+    def close(self):
+        # Views into the buffer must go before the mapping can be closed
+        del self.header, self.records
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,172 @@
+import json
+import math
+import numbers
+from ahrs_Mad import AhrsOutput, BOOLEAN_INTERNAL_STATES, FLAG_FIELDS, INTERNAL_STATE_FIELDS
+from frame_codec import FRAME_FIELDS, WIRE_FORMATS
+
+# How a rate limited subscription summarises the frames it skips:
+#   'latest'    - send the newest frame, skipped frames are discarded
+#   'aggregate' - send the newest frame with flags and ignored states OR'ed and
+#                 error values maxed over the skipped frames, so a slow dashboard
+#                 still sees short recoveries and rejections
+DECIMATION_MODES = ('latest', 'aggregate')
+ERROR_FIELDS = tuple(key for key in INTERNAL_STATE_FIELDS if key not in BOOLEAN_INTERNAL_STATES)
+STATUS_FIELDS = FLAG_FIELDS + BOOLEAN_INTERNAL_STATES
+
+
+def names(key, value):
+    """ A list of strings for the fields and devices keys, also accepting a single string; None stays None """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, (list, tuple)) or not all(isinstance(name, str) for name in value):
+        raise ValueError(f"{key} must be a list of strings, got {value!r}")
+    return list(value)
+
+
+class Subscription:
+    """
+    What a client wants to receive. Equal subscriptions share one stream, so a
+    frame is encoded once per distinct subscription however many clients use it.
+
+    Clients send it as a JSON text message, on connect or at any time later:
+        {"fields": ["quaternion"], "max_rate_hz": 90, "decimation": "latest", "format": "binary",
+         "devices": ["phone"]}
+    Every key is optional; fields and devices may also be a single string. Binary
+    formats always carry their fixed layout, so fields only applies to JSON.
+    Rate limits apply to each device separately. Malformed values raise ValueError.
+
+    :param wire_format: One of frame_codec.WIRE_FORMATS.
+    :param fields: Top level keys of the JSON frame to send, None for all of them.
+    :param max_rate_hz: Maximum frames per second, None for every fused frame.
+    :param decimation: One of DECIMATION_MODES, used when max_rate_hz is set.
+    :param devices: Ids of the devices to receive frames from, None for all of them.
+    """
+    def __init__(self, wire_format='json', fields=None, max_rate_hz=None, decimation='latest', devices=None):
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format {wire_format!r}, expected one of {WIRE_FORMATS}")
+        fields = names('fields', fields)
+        devices = names('devices', devices)
+        if fields is not None:
+            unknown = set(fields) - set(FRAME_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown fields {sorted(unknown)}, expected some of {FRAME_FIELDS}")
+            fields = tuple(key for key in FRAME_FIELDS if key in fields)
+        if max_rate_hz is not None and (isinstance(max_rate_hz, bool) or not isinstance(max_rate_hz, numbers.Real)):
+            raise ValueError(f"max_rate_hz must be a number, got {max_rate_hz!r}")
+        if max_rate_hz is not None and not (0 < max_rate_hz < math.inf):
+            raise ValueError("max_rate_hz must be positive and finite")
+        if decimation not in DECIMATION_MODES:
+            raise ValueError(f"Unknown decimation mode {decimation!r}, expected one of {DECIMATION_MODES}")
+        self.wire_format = wire_format
+        self.fields = fields
+        self.max_rate_hz = float(max_rate_hz) if max_rate_hz is not None else None
+        self.decimation = decimation
+        self.devices = tuple(sorted(devices)) if devices is not None else None
+
+    @classmethod
+    def from_message(cls, message, default=None):
+        """ Parse a client's JSON subscription message; missing keys keep the values of default """
+        request = json.loads(message)
+        if not isinstance(request, dict):
+            raise ValueError("A subscription must be a JSON object")
+        default = default or cls()
+        return cls(
+            wire_format=request.get('format', default.wire_format),
+            fields=request.get('fields', default.fields),
+            max_rate_hz=request.get('max_rate_hz', default.max_rate_hz),
+            decimation=request.get('decimation', default.decimation),
+            devices=request.get('devices', default.devices),
+        )
+
+    def key(self):
+        return (self.wire_format, self.fields, self.max_rate_hz, self.decimation, self.devices)
+
+    def __eq__(self, other):
+        return isinstance(other, Subscription) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return (f"Subscription(wire_format={self.wire_format!r}, fields={self.fields!r}, "
+                f"max_rate_hz={self.max_rate_hz!r}, decimation={self.decimation!r}, devices={self.devices!r})")
+
+
+class DeviceSchedule:
+    """
+    Rate limiter of one device within a SubscriptionStream. Frames are scheduled
+    on sensor timestamps, so rates also hold for replays that run faster than
+    real time.
+    """
+    def __init__(self, interval, aggregate):
+        self.interval = interval
+        self.aggregate = aggregate
+        self.next_due = None
+        # Status accumulated over skipped frames for 'aggregate' decimation
+        self.summary = AhrsOutput()
+        self.accumulated = False
+
+    def due(self, timestamp):
+        if self.interval is None or timestamp is None:
+            return True
+        if self.next_due is None or timestamp >= self.next_due:
+            # Keep the average rate when frames arrive a little late, but do not
+            # burst to catch up after a gap
+            if self.next_due is None or timestamp - self.next_due >= self.interval:
+                self.next_due = timestamp + self.interval
+            else:
+                self.next_due += self.interval
+            return True
+        return False
+
+    def accumulate(self, output):
+        summary = self.summary
+        if not self.accumulated:
+            for key in STATUS_FIELDS + ERROR_FIELDS:
+                setattr(summary, key, getattr(output, key))
+            self.accumulated = True
+            return
+        for key in STATUS_FIELDS:
+            if getattr(output, key):
+                setattr(summary, key, True)
+        for key in ERROR_FIELDS:
+            setattr(summary, key, max(getattr(summary, key), getattr(output, key)))
+
+    def offer(self, output):
+        """ Return the frame to send for this fused output, or None if it is skipped """
+        if self.aggregate:
+            self.accumulate(output)
+        if not self.due(output.timestamp):
+            return None
+        if not self.aggregate:
+            return output
+
+        summary = self.summary
+        summary.timestamp = output.timestamp
+        summary.quaternion = output.quaternion
+        summary.euler_angles = output.euler_angles
+        summary.orientation = output.orientation
+        self.accumulated = False
+        return summary
+
+
+class SubscriptionStream:
+    """ The clients sharing one subscription, with a rate limiter per device """
+    def __init__(self, subscription):
+        self.subscription = subscription
+        self.channels = set()
+        self.interval = 1.0 / subscription.max_rate_hz if subscription.max_rate_hz else None
+        self.aggregate = self.interval is not None and subscription.decimation == 'aggregate'
+        self.schedules = {}
+
+    def offer(self, output, device_id=None):
+        """ Return the frame to send for this fused output of device_id, or None if it is skipped """
+        devices = self.subscription.devices
+        if devices is not None and device_id not in devices:
+            return None
+        schedule = self.schedules.get(device_id)
+        if schedule is None:
+            schedule = self.schedules[device_id] = DeviceSchedule(self.interval, self.aggregate)
+        return schedule.offer(output)
@@ -1,33 +1,22 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-import math
+from pointing import euler_hits
 
 # Ensure correct display backend
 plt.switch_backend('TkAgg')
 
-def calculate_laser_intersection(yaw, pitch):
-    yaw_rad = math.radians(yaw)
-    pitch_rad = math.radians(pitch)
-    
-    dx = math.cos(pitch_rad) * math.sin(yaw_rad)
-    dy = math.cos(pitch_rad) * math.cos(yaw_rad)
-    dz = -math.sin(pitch_rad)
-    
-    if dz == 0:
-        return None
-    
-    t = -2500 / dz
-    x = t * dx
-    y = t * dy
-    return (x, y)
+def calculate_laser_intersections(yaw, pitch):
+    """ Hits on the plane z = -2500 for arrays of compass yaw (clockwise) and pitch, in degrees """
+    # Heading and elevation of a laser along +y are the rotation Rz(-yaw) @ Rx(-pitch)
+    return euler_hits(-yaw, 0, -pitch, boresight=(0, 1, 0), axis=2, offset=-2500, degrees=True)
 
 # Global list to accumulate laser points
 laser_points = []
 
 def animate(i):
-    point = calculate_laser_intersection(data['yaw'][i], data['pitch'][i])
-    if point is not None:
+    if valid[i]:
+        point = hits[i]
         laser_points.append(point)
         
         # Update plot limits dynamically based on new point
@@ -41,8 +30,9 @@ def animate(i):
         line.set_data(zip(*laser_points))  # Unpack list of tuples to separate lists
     return line,
 
-# Load data from CSV
+# Load data from CSV and project every sample in one pass
 data = pd.read_csv('angles.csv')
+hits, valid = calculate_laser_intersections(data['yaw'].to_numpy(), data['pitch'].to_numpy())
 
 # Initialize plot with initial limits (can be adjusted if needed)
 fig, ax = plt.subplots()
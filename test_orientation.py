@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from pointing import euler_to_matrices
+
+ANGLES = [(0, 0, 0), (30, 0, 0), (0, 45, 0), (0, 0, 60), (10, 20, 30), (-75, 40, 170), (120, -80, -35)]
+
+
+def axis_rotation(angle_deg, axis):
+    """ The matrix QMatrix4x4.rotate(angle, x, y, z) multiplies by (right-handed, axis normalised) """
+    x, y, z = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+    c, s = np.cos(np.radians(angle_deg)), np.sin(np.radians(angle_deg))
+    return np.array([
+        [c + x * x * (1 - c), x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+        [y * x * (1 - c) + z * s, c + y * y * (1 - c), y * z * (1 - c) - x * s],
+        [z * x * (1 - c) - y * s, z * y * (1 - c) + x * s, c + z * z * (1 - c)],
+    ])
+
+
+def rotate_sequence(roll, pitch, yaw):
+    """
+    The transform ahrsMain built before update_3d_view_euler used one matrix:
+    resetTransform(), then rotate() about X, Y and Z with local=False, which
+    pyqtgraph applies in front of the existing transform.
+    """
+    transform = np.eye(3)
+    for angle, axis in ((roll, (1, 0, 0)), (pitch, (0, 1, 0)), (yaw, (0, 0, 1))):
+        transform = axis_rotation(angle, axis) @ transform
+    return transform
+
+
+@pytest.mark.parametrize("roll, pitch, yaw", ANGLES)
+def test_euler_matrix_matches_rotate_sequence(roll, pitch, yaw):
+    matrix = euler_to_matrices(yaw, pitch, roll, degrees=True)[0]
+    np.testing.assert_allclose(matrix, rotate_sequence(roll, pitch, yaw), atol=1e-12)
+
+
+@pytest.mark.parametrize("roll, pitch, yaw", ANGLES)
+def test_euler_matrix_matches_pyqtgraph_item(roll, pitch, yaw):
+    gl = pytest.importorskip("pyqtgraph.opengl")
+    item = gl.GLGraphicsItem.GLGraphicsItem()
+    item.resetTransform()
+    item.rotate(roll, 1.0, 0.0, 0.0)
+    item.rotate(pitch, 0.0, 1.0, 0.0)
+    item.rotate(yaw, 0.0, 0.0, 1.0)
+    expected = np.array(item.transform().data()).reshape(4, 4).T[:3, :3]
+    matrix = euler_to_matrices(yaw, pitch, roll, degrees=True)[0]
+    np.testing.assert_allclose(matrix, expected, atol=1e-5)
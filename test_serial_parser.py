@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from serial_parser import AsciiLineParser
+
+LINE = "1000 0.1 0.2 9.8 0.01 0.02 0.03 20 5 -40"
+
+
+def data_batches(events):
+    return [payload for kind, payload in events if kind == 'data']
+
+
+@pytest.mark.parametrize("prefix", ["", " ", "  ", "\t", " \t"])
+def test_data_line_with_leading_whitespace(prefix):
+    parser = AsciiLineParser()
+    events = parser.feed(f"{prefix}{LINE}\r\n".encode())
+    batches = data_batches(events)
+    assert len(batches) == 1
+    assert batches[0]['timestamp'].tolist() == [1000]
+    np.testing.assert_allclose(batches[0]['accel'], [[0.1, 0.2, 9.8]])
+    np.testing.assert_allclose(batches[0]['mag'], [[20, 5, -40]])
+    assert parser.garbage == 0
+
+
+def test_indented_lines_stay_in_one_run():
+    parser = AsciiLineParser()
+    lines = [LINE.replace("1000", str(1000 + i), 1) for i in range(4)]
+    text = f"{lines[0]}\r\n {lines[1]}\r\n\t{lines[2]}\r\n{lines[3]}\r\n"
+    batches = data_batches(parser.feed(text.encode()))
+    assert len(batches) == 1
+    assert batches[0]['timestamp'].tolist() == [1000, 1001, 1002, 1003]
+
+
+def test_status_and_garbage_lines():
+    parser = AsciiLineParser()
+    events = parser.feed(f"{LINE}\r\nStart compass calibration\r\nnoise\r\n  {LINE}\r\n".encode())
+    assert [kind for kind, _ in events] == ['data', 'calibration_start', 'garbage', 'data']
+    assert parser.garbage == 1
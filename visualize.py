@@ -8,7 +8,7 @@ import pyqtgraph.opengl as gl
 from pyqtgraph.opengl import GLMeshItem, GLScatterPlotItem
 from filterpy.kalman import ExtendedKalmanFilter
 from filterpy.common import Q_discrete_white_noise
-import math
+from pointing import euler_hits
 
 # Dictionary to store the latest readings
 latest_sensor_data = {
@@ -30,38 +30,11 @@ def calculate_pitch_roll(accel):
 
 def calculate_laser_intersection(yaw, pitch, roll, p=-2500):
     """ Calculate the intersection of the laser with a plane at z = p. """
-    yaw_rad = math.radians(yaw)
-    pitch_rad = math.radians(pitch)
-    roll_rad = math.radians(roll)
-    
-    # Rotation matrices
-    R_yaw = np.array([
-        [math.cos(yaw_rad), -math.sin(yaw_rad), 0],
-        [math.sin(yaw_rad), math.cos(yaw_rad), 0],
-        [0, 0, 1]
-    ])
-    R_pitch = np.array([
-        [math.cos(pitch_rad), 0, math.sin(pitch_rad)],
-        [0, 1, 0],
-        [-math.sin(pitch_rad), 0, math.cos(pitch_rad)]
-    ])
-    R_roll = np.array([
-        [1, 0, 0],
-        [0, math.cos(roll_rad), -math.sin(roll_rad)],
-        [0, math.sin(roll_rad), math.cos(roll_rad)]
-    ])
-    
-    # Apply rotations to a forward-pointing vector
-    direction = np.array([0, 0, 1])  # Assuming the laser points forward
-    direction = R_yaw @ R_pitch @ R_roll @ direction
-    dx, dy, dz = direction
-    
-    if dz == 0:
-        return None  # Prevent division by zero if laser points parallel to the plane
-    
-    t = p / dz  # Solve for intersection with plane
-    x = t * dx
-    y = t * dy
+    # Laser points forward along +z from the origin
+    hits, valid = euler_hits(yaw, pitch, roll, boresight=(0, 0, 1), axis=2, offset=p, degrees=True)
+    if not valid[0]:
+        return None  # Laser parallel to the plane
+    x, y = hits[0]
     return (x, y)
 
 def setup_ekf():